@@ -15,17 +15,19 @@ from modules_forge.forge_util import numpy_to_pytorch, pytorch_to_numpy
 from ldm_patched.modules.sd import load_checkpoint_guess_config
 from ldm_patched.modules import model_management
 
+import json
 import tempfile
 import time
 import random
 import string
 
 import numpy as np
-import rembg
+from rembg.profiling import Profile, stage_hook
+from rembg.session_factory import SessionManager
 from PIL import Image
 
 from tsr.system import TSR
-from tsr.utils import remove_background, resize_foreground, to_gradio_3d_orientation
+from tsr.utils import TURNTABLE_PRESETS, remove_background, resize_foreground, save_video, to_gradio_3d_orientation
 
 if torch.cuda.is_available():
     device = "cuda:0"
@@ -47,8 +49,8 @@ def get_rembg_model_choices():
         "u2net_human_seg", 
         "u2net", 
         "u2netp", 
+        "sam",
     ]
-        # "sam", #- FIXME - not currently working
 
 def update_model_filenames():
     global triposr_model_filenames
@@ -68,7 +70,8 @@ model = TSR.from_pretrained(
 model.renderer.set_chunk_size(8192)
 model.to(device)
 
-# rembg_session = rembg.new_session(model_name="dis_general_use")
+# rembg sessions are kept between runs, so the SAM image embedding is reused when only the prompt changes
+rembg_sessions = SessionManager()
 
 def check_input_image(input_image):
     if input_image is None:
@@ -87,7 +90,9 @@ def preprocess(
     alpha_matting=False,
     alpha_matting_foreground_threshold=240,
     alpha_matting_background_threshold=10,
-    alpha_matting_erode_size=0
+    alpha_matting_erode_size=0,
+    show_timings=False,
+    sam_prompt="[]"
 ):
     def fill_background(image):
         image = np.array(image).astype(np.float32) / 255.0
@@ -95,23 +100,44 @@ def preprocess(
         image = Image.fromarray((image * 255.0).astype(np.uint8))
         return image
 
+    rembg_kwargs = {}
+    if rembg_model == "sam":
+        rembg_kwargs["sam_prompt"] = json.loads(sam_prompt or "[]")
+
+    timings = Profile()
     if do_remove_background:
         image = input_image.convert("RGB")
-        image = remove_background(
-            image,
-            rembg.new_session(model_name=rembg_model),
-            alpha_matting=alpha_matting,
-            alpha_matting_foreground_threshold=alpha_matting_foreground_threshold,
-            alpha_matting_background_threshold=alpha_matting_background_threshold,
-            alpha_matting_erode_size=alpha_matting_erode_size
-        )
+        with stage_hook(timings if show_timings else None):
+            image = remove_background(
+                image,
+                rembg_sessions.get(rembg_model),
+                alpha_matting=alpha_matting,
+                alpha_matting_foreground_threshold=alpha_matting_foreground_threshold,
+                alpha_matting_background_threshold=alpha_matting_background_threshold,
+                alpha_matting_erode_size=alpha_matting_erode_size,
+                **rembg_kwargs
+            )
         image = resize_foreground(image, foreground_ratio)
         image = fill_background(image)
     else:
         image = input_image
         if image.mode == "RGBA":
             image = fill_background(image)
-    return image
+    return image, timings.summary()
+
+def add_sam_point(sam_prompt, rembg_model, evt: gr.SelectData):
+    # with SAM, a click on the input image adds a foreground point to the prompt
+    if rembg_model != "sam":
+        return sam_prompt
+    prompt = json.loads(sam_prompt or "[]")
+    prompt.append({"type": "point", "data": list(evt.index), "label": 1})
+    return json.dumps(prompt)
+
+def preview_sam_cutout(input_image, rembg_model, *args):
+    # with SAM, refresh the cutout after each click; only the decoder runs again
+    if input_image is None or rembg_model != "sam":
+        return gr.update(), gr.update()
+    return preprocess(input_image, rembg_model, *args)
 
 def generate_random_filename(extension=".txt"):
     timestamp = time.strftime("%Y%m%d-%H%M%S")
@@ -138,11 +164,11 @@ def generate(image, resolution, threshold):
     if image.mode == 'RGBA':
         image = image.convert('RGB')
     scene_codes = model(image, device=device)
-    mesh = model.extract_mesh(scene_codes, resolution=int(resolution), threshold=float(threshold))[0]
+    mesh = model.extract_mesh(scene_codes, resolution=int(resolution), threshold=float(threshold), return_type="np")[0]
     mesh = to_gradio_3d_orientation(mesh)
     
-    # Convert the mesh to a string or use a method to directly get the OBJ data
-    obj_data = mesh.export(file_type='obj')  # This line might need adjustment based on how your mesh object works
+    # The array-backed mesh writes OBJ data directly, without building a trimesh
+    obj_data = mesh.export(file_type='obj')
 
     # Now save using the new function
     mesh_path = write_obj_to_triposr(obj_data)  # You could specify a filename if you want
@@ -154,6 +180,39 @@ def generate(image, resolution, threshold):
 
     return mesh_path, relative_mesh_path
 
+def render_preview(image, preset):
+    if image.mode == 'RGBA':
+        image = image.convert('RGB')
+    scene_codes = model(image, device=device)
+
+    # Coarse frames arrive first, then the full frame is refined band by band
+    settings = TURNTABLE_PRESETS[preset]
+    yield from model.render_progressive(
+        scene_codes[0],
+        height=settings["height"],
+        width=settings["width"],
+        num_samples_per_ray=settings["num_samples_per_ray"],
+    )
+
+def render_turntable(image, preset, n_views, fps):
+    if image.mode == 'RGBA':
+        image = image.convert('RGB')
+    scene_codes = model(image, device=device)
+
+    triposr_folder = os.path.join(default_output_dir, 'TripoSR')
+    os.makedirs(triposr_folder, exist_ok=True)
+    video_path = os.path.join(triposr_folder, generate_random_filename('.mp4'))
+
+    # Frames are streamed into the video writer as they are rendered
+    save_video(
+        model.render_iter(
+            scene_codes[0], int(n_views), return_type="uint8", **TURNTABLE_PRESETS[preset]
+        ),
+        video_path,
+        fps=int(fps),
+    )
+    return video_path
+
 
 def on_ui_tabs():
     with gr.Blocks() as model_block:
@@ -197,6 +256,13 @@ def on_ui_tabs():
                             choices=get_rembg_model_choices(),
                             value="dis_general_use",  # Default value
                         )
+                        with gr.Row():
+                            sam_prompt = gr.Textbox(
+                                label="SAM Prompt (click the input image to add points)",
+                                value="[]",
+                                scale=4,
+                            )
+                            clear_sam_prompt = gr.Button("Clear Points", scale=1)
                         do_remove_background = gr.Checkbox(
                             label="Remove Background", value=True
                         )
@@ -232,6 +298,12 @@ def on_ui_tabs():
                             value=0,
                             step=1,
                         )
+                        show_timings = gr.Checkbox(
+                            label="Show Cutout Stage Timings", value=False
+                        )
+                        cutout_timings = gr.Textbox(
+                            label="Cutout Stage Timings", interactive=False, lines=4
+                        )
                 gr.Markdown("\n")
                 with gr.Row():
                     with gr.Group():
@@ -279,6 +351,54 @@ def on_ui_tabs():
 
                         obj_file_path = gr.Textbox(visible=False, elem_id="obj_file_path")  # Hidden textbox to pass the OBJ file path
 
+                    with gr.Tab("Turntable"):
+                        turntable_preview = gr.Image(
+                            label="Progressive Preview",
+                            type="pil",
+                            interactive=False,
+                            elem_id="triposrPreview"
+                        )
+                        turntable_video = gr.Video(
+                            label="Turntable Preview",
+                            interactive=False,
+                            elem_id="triposrTurntable"
+                        )
+                        turntable_preset = gr.Dropdown(
+                            label="Render Preset",
+                            choices=list(TURNTABLE_PRESETS.keys()),
+                            value="preview",
+                        )
+                        turntable_n_views = gr.Slider(
+                            label="Frames",
+                            minimum=8,
+                            maximum=120,
+                            value=30,
+                            step=1,
+                        )
+                        turntable_fps = gr.Slider(
+                            label="FPS",
+                            minimum=1,
+                            maximum=60,
+                            value=30,
+                            step=1,
+                        )
+                        submit_preview = gr.Button("Render Preview", elem_id="turntable_preview", variant="secondary")
+                        submit_preview.click(
+                            fn=check_cutout_image, inputs=[processed_image]
+                        ).success(
+                            fn=render_preview,
+                            inputs=[processed_image, turntable_preset],
+                            outputs=[turntable_preview]
+                        )
+                        submit_turntable = gr.Button("Render Turntable Video", elem_id="turntable", variant="secondary")
+                        submit_turntable.click(
+                            fn=check_cutout_image, inputs=[processed_image]
+                        ).success(
+                            fn=render_turntable,
+                            inputs=[processed_image, turntable_preset, turntable_n_views, turntable_fps],
+                            outputs=[turntable_video]
+                        )
+
                     # with gr.Tab("Test"):
                     #     subject = gr.Textbox(placeholder="subject")
                     #     verb = gr.Radio(["ate", "loved", "hated"])
@@ -439,21 +559,38 @@ def on_ui_tabs():
                             '''
                         )                
 
+            preprocess_inputs = [
+                input_image,
+                rembg_model_dropdown,
+                do_remove_background,
+                foreground_ratio,
+                alpha_matting,
+                alpha_matting_foreground_threshold,
+                alpha_matting_background_threshold,
+                alpha_matting_erode_size,
+                show_timings,
+                sam_prompt
+            ]
+
+            input_image.select(
+                fn=add_sam_point,
+                inputs=[sam_prompt, rembg_model_dropdown],
+                outputs=[sam_prompt]
+            ).then(
+                fn=preview_sam_cutout,
+                inputs=preprocess_inputs,
+                outputs=[processed_image, cutout_timings]
+            )
+            clear_sam_prompt.click(fn=lambda: "[]", outputs=[sam_prompt])
+            # points belong to the image they were clicked on
+            input_image.change(fn=lambda: "[]", outputs=[sam_prompt])
+
             submit_preprocess.click(
                 fn=check_input_image, inputs=[input_image]
             ).success(
                 fn=preprocess,
-                inputs=[
-                    input_image, 
-                    rembg_model_dropdown,
-                    do_remove_background, 
-                    foreground_ratio,
-                    alpha_matting,
-                    alpha_matting_foreground_threshold,
-                    alpha_matting_background_threshold,
-                    alpha_matting_erode_size
-                ],
-                outputs=[processed_image]
+                inputs=preprocess_inputs,
+                outputs=[processed_image, cutout_timings]
             )
 
             submit_postprocess.click(
@@ -468,17 +605,8 @@ def on_ui_tabs():
                 fn=check_input_image, inputs=[input_image]
             ).success(
                 fn=preprocess,
-                inputs=[
-                    input_image, 
-                    rembg_model_dropdown,
-                    do_remove_background, 
-                    foreground_ratio,
-                    alpha_matting,
-                    alpha_matting_foreground_threshold,
-                    alpha_matting_background_threshold,
-                    alpha_matting_erode_size
-                ],
-                outputs=[processed_image]
+                inputs=preprocess_inputs,
+                outputs=[processed_image, cutout_timings]
             ).success(
                 fn=generate,
                 inputs=[processed_image, resolution2, threshold],
@@ -2,5 +2,5 @@ from . import _version
 
 __version__ = _version.get_versions()["version"]
 
-from .bg import remove
+from .bg import remove, remove_batch
 from .session_factory import new_session
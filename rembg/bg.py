@@ -1,15 +1,22 @@
 import io
 from enum import Enum
-from typing import Any, List, Optional, Tuple, Union
+from typing import Any, Dict, List, Optional, Tuple, Union
 
 import numpy as np
 from cv2 import (
     BORDER_DEFAULT,
+    COLOR_RGB2GRAY,
+    INTER_AREA,
+    INTER_LINEAR,
+    INTER_NEAREST,
     MORPH_ELLIPSE,
     MORPH_OPEN,
     GaussianBlur,
+    boxFilter,
+    cvtColor,
     getStructuringElement,
     morphologyEx,
+    resize,
 )
 from PIL import Image, ImageOps
 from PIL.Image import Image as PILImage
@@ -18,12 +25,24 @@ from pymatting.foreground.estimate_foreground_ml import estimate_foreground_ml
 from pymatting.util.util import stack_images
 from scipy.ndimage import binary_erosion
 
+from .profiling import stage, stage_hook
 from .session_factory import new_session
 from .sessions import sessions_class
 from .sessions.base import BaseSession
 
 kernel = getStructuringElement(MORPH_ELLIPSE, (3, 3))
 
+ALPHA_MATTING_MODES = ["cf", "fast"]
+
+OUTPUT_FORMATS = ["png", "webp", "raw"]
+
+ENCODE_OPTIONS = [
+    "output_format",
+    "png_compress_level",
+    "webp_quality",
+    "webp_lossless",
+]
+
 
 class ReturnType(Enum):
     BYTES = 0
@@ -31,12 +50,144 @@ class ReturnType(Enum):
     NDARRAY = 2
 
 
+def guided_filter(
+    guide: np.ndarray, src: np.ndarray, radius: int, eps: float
+) -> np.ndarray:
+    """
+    Smooth `src` while following the edges of the grayscale `guide` image.
+
+    This is the guided filter of He et al., built from box filters so it runs in
+    linear time regardless of `radius`. Both arrays are float images of the same size.
+    """
+    ksize = (2 * radius + 1, 2 * radius + 1)
+
+    mean_guide = boxFilter(guide, -1, ksize)
+    mean_src = boxFilter(src, -1, ksize)
+    cov_guide_src = boxFilter(guide * src, -1, ksize) - mean_guide * mean_src
+    var_guide = boxFilter(guide * guide, -1, ksize) - mean_guide * mean_guide
+
+    a = cov_guide_src / (var_guide + eps)
+    b = mean_src - a * mean_guide
+
+    return boxFilter(a, -1, ksize) * guide + boxFilter(b, -1, ksize)
+
+
+def estimate_alpha_band(
+    img: np.ndarray, trimap: np.ndarray, tile_size: int = 256, margin: int = 32
+) -> np.ndarray:
+    """
+    Closed-form matting restricted to the unknown band of the trimap.
+
+    The image is split into `tile_size` tiles and `estimate_alpha_cf` only runs on the
+    tiles that contain unknown pixels, each padded by `margin` pixels of context, so the
+    cost follows the length of the object boundary instead of the image area. Known
+    pixels keep their trimap value. Tiles whose padded area holds no known pixel can't
+    be solved and keep the unknown value.
+    """
+    alpha = trimap.copy()
+    is_unknown = (trimap > 0) & (trimap < 1)
+    height, width = trimap.shape
+
+    for y in range(0, height, tile_size):
+        for x in range(0, width, tile_size):
+            y1, x1 = min(y + tile_size, height), min(x + tile_size, width)
+            if not is_unknown[y:y1, x:x1].any():
+                continue
+
+            py0, px0 = max(y - margin, 0), max(x - margin, 0)
+            py1, px1 = min(y1 + margin, height), min(x1 + margin, width)
+            if is_unknown[py0:py1, px0:px1].all():
+                continue
+
+            tile_alpha = estimate_alpha_cf(
+                img[py0:py1, px0:px1], trimap[py0:py1, px0:px1]
+            )
+            alpha[y:y1, x:x1] = tile_alpha[y - py0 : y1 - py0, x - px0 : x1 - px0]
+
+    return alpha
+
+
+def estimate_alpha_fast(
+    img: np.ndarray, trimap: np.ndarray, scale: float = 1.0
+) -> np.ndarray:
+    """
+    Fast alternative to `estimate_alpha_cf` for large images.
+
+    Alpha is solved only in the unknown band of the trimap (see `estimate_alpha_band`).
+    With `scale` below 1 the band is solved on a downscaled copy, and the alpha is then
+    upsampled and refined with a guided filter on the full resolution image, so edges
+    follow the original detail. Known trimap pixels are kept exactly.
+    """
+    if scale <= 0:
+        raise ValueError(f"alpha matting scale must be positive, got {scale}")
+
+    if scale >= 1.0:
+        return estimate_alpha_band(img, trimap)
+
+    height, width = trimap.shape
+    small_size = (max(int(width * scale), 1), max(int(height * scale), 1))
+    small_img = resize(img, small_size, interpolation=INTER_AREA)
+    small_trimap = resize(trimap, small_size, interpolation=INTER_NEAREST)
+
+    alpha = estimate_alpha_band(small_img, small_trimap)
+    alpha = resize(alpha, (width, height), interpolation=INTER_LINEAR)
+
+    guide = cvtColor(img.astype(np.float32), COLOR_RGB2GRAY).astype(np.float64)
+    radius = max(int(round(2 / scale)), 1)
+    alpha = guided_filter(guide, alpha, radius, 1e-4)
+
+    alpha[trimap >= 1] = 1.0
+    alpha[trimap <= 0] = 0.0
+    return np.clip(alpha, 0.0, 1.0)
+
+
+def estimate_foreground_band(
+    img: np.ndarray,
+    alpha: np.ndarray,
+    trimap: np.ndarray,
+    tile_size: int = 256,
+    margin: int = 32,
+) -> np.ndarray:
+    """
+    Foreground estimation restricted to the unknown band of the trimap.
+
+    Pixels outside the unknown region are copied from the image, and
+    `estimate_foreground_ml` only runs on the `tile_size` tiles that contain unknown
+    pixels, each padded by `margin` pixels of context, so the cost follows the length
+    of the object boundary instead of the image area. `alpha` should already hold
+    exactly 0 and 1 on the known pixels of the trimap.
+    """
+    foreground = img.copy()
+    is_unknown = (trimap > 0) & (trimap < 1)
+    height, width = trimap.shape
+
+    for y in range(0, height, tile_size):
+        for x in range(0, width, tile_size):
+            y1, x1 = min(y + tile_size, height), min(x + tile_size, width)
+            tile_unknown = is_unknown[y:y1, x:x1]
+            if not tile_unknown.any():
+                continue
+
+            py0, px0 = max(y - margin, 0), max(x - margin, 0)
+            py1, px1 = min(y1 + margin, height), min(x1 + margin, width)
+
+            tile_foreground = estimate_foreground_ml(
+                img[py0:py1, px0:px1], alpha[py0:py1, px0:px1]
+            )
+            tile_foreground = tile_foreground[y - py0 : y1 - py0, x - px0 : x1 - px0]
+            foreground[y:y1, x:x1][tile_unknown] = tile_foreground[tile_unknown]
+
+    return foreground
+
+
 def alpha_matting_cutout(
     img: PILImage,
     mask: PILImage,
     foreground_threshold: int,
     background_threshold: int,
     erode_structure_size: int,
+    mode: str = "cf",
+    scale: float = 1.0,
 ) -> PILImage:
     """
     Perform alpha matting on an image using a given mask and threshold values.
@@ -46,6 +197,9 @@ def alpha_matting_cutout(
     foreground and background pixels. The `erode_structure_size` parameter specifies
     the size of the erosion structure to be applied to the mask.
 
+    The `mode` selects the alpha solver: "cf" runs closed-form matting over the whole
+    image, "fast" uses `estimate_alpha_fast` with the given `scale`.
+
     The function returns a PIL image representing the cutout of the foreground object
     from the original image.
     """
@@ -74,8 +228,13 @@ def alpha_matting_cutout(
     img_normalized = img / 255.0
     trimap_normalized = trimap / 255.0
 
-    alpha = estimate_alpha_cf(img_normalized, trimap_normalized)
-    foreground = estimate_foreground_ml(img_normalized, alpha)
+    if mode == "fast":
+        alpha = estimate_alpha_fast(img_normalized, trimap_normalized, scale)
+    else:
+        alpha = estimate_alpha_cf(img_normalized, trimap_normalized)
+    alpha[trimap_normalized >= 1] = 1.0
+    alpha[trimap_normalized <= 0] = 0.0
+    foreground = estimate_foreground_band(img_normalized, alpha, trimap_normalized)
     cutout = stack_images(foreground, alpha)
 
     cutout = np.clip(cutout * 255, 0, 255).astype(np.uint8)
@@ -84,7 +243,48 @@ def alpha_matting_cutout(
     return cutout
 
 
-def naive_cutout(img: PILImage, mask: PILImage) -> PILImage:
+def blend(src: np.ndarray, dst: np.ndarray, alpha: np.ndarray) -> np.ndarray:
+    """
+    Blend `src` over `dst` with an 8-bit `alpha`, rounding exactly like PIL's masked paste.
+
+    Args:
+        src (np.ndarray): The uint8 source values.
+        dst (np.ndarray): The uint8 destination values, broadcastable to `src`.
+        alpha (np.ndarray): The uint8 weights of `src`, broadcastable to `src`.
+
+    Returns:
+        np.ndarray: The blended uint8 values.
+    """
+    alpha = alpha.astype(np.uint32)
+    tmp = src * alpha + dst * (255 - alpha) + 128
+    return ((tmp + (tmp >> 8)) >> 8).astype(np.uint8)
+
+
+def rgba_array(img: np.ndarray) -> np.ndarray:
+    """
+    Split an image array into its RGB channels and its alpha channel.
+
+    Grayscale arrays are repeated into RGB and images without alpha get an opaque alpha.
+
+    Args:
+        img (np.ndarray): The (H, W), (H, W, 3) or (H, W, 4) uint8 image.
+
+    Returns:
+        np.ndarray: A (H, W, 4) uint8 view of the channels, broadcast where they were missing.
+    """
+    if img.ndim == 2:
+        img = img[:, :, None]
+    if img.shape[2] == 1:
+        img = np.broadcast_to(img, img.shape[:2] + (3,))
+    if img.shape[2] == 3:
+        alpha = np.full(img.shape[:2] + (1,), 255, dtype=np.uint8)
+        return np.concatenate([img, alpha], axis=2)
+    return img
+
+
+def naive_cutout(
+    img: Union[PILImage, np.ndarray], mask: Union[PILImage, np.ndarray]
+) -> Union[PILImage, np.ndarray]:
     """
     Perform a simple cutout operation on an image using a mask.
 
@@ -93,42 +293,76 @@ def naive_cutout(img: PILImage, mask: PILImage) -> PILImage:
     cut out based on the mask.
 
     The function returns a PIL image representing the cutout of the original
-    image using the mask.
+    image using the mask. If `img` is a numpy array, the cutout is computed and
+    returned as a (H, W, 4) array, with the same values as the PIL path.
     """
+    if isinstance(img, np.ndarray):
+        return blend(rgba_array(img), 0, np.asarray(mask)[:, :, None])
+
     empty = Image.new("RGBA", (img.size), 0)
     cutout = Image.composite(img, empty, mask)
     return cutout
 
 
-def putalpha_cutout(img: PILImage, mask: PILImage) -> PILImage:
+def putalpha_cutout(
+    img: Union[PILImage, np.ndarray], mask: Union[PILImage, np.ndarray]
+) -> Union[PILImage, np.ndarray]:
     """
     Apply the specified mask to the image as an alpha cutout.
 
     Args:
-        img (PILImage): The image to be modified.
-        mask (PILImage): The mask to be applied.
+        img (Union[PILImage, np.ndarray]): The image to be modified. Arrays are not modified, a new (H, W, 4)
+            array is returned instead.
+        mask (Union[PILImage, np.ndarray]): The mask to be applied.
 
     Returns:
-        PILImage: The modified image with the alpha cutout applied.
+        Union[PILImage, np.ndarray]: The modified image with the alpha cutout applied.
     """
+    if isinstance(img, np.ndarray):
+        cutout = np.array(rgba_array(img))
+        cutout[:, :, 3] = np.asarray(mask)
+        return cutout
+
     img.putalpha(mask)
     return img
 
 
-def get_concat_v_multi(imgs: List[PILImage]) -> PILImage:
+def get_concat_v_multi(
+    imgs: List[Union[PILImage, np.ndarray]]
+) -> Union[PILImage, np.ndarray]:
     """
     Concatenate multiple images vertically.
 
+    The images are copied once into a single preallocated RGBA array, as wide as the first image,
+    with the same result as pasting them one below the other. A single image is returned as is.
+
     Args:
-        imgs (List[PILImage]): The list of images to be concatenated.
+        imgs (List[Union[PILImage, np.ndarray]]): The list of images to be concatenated.
 
     Returns:
-        PILImage: The concatenated image.
+        Union[PILImage, np.ndarray]: The concatenated image, an array if the first image is an array.
     """
-    pivot = imgs.pop(0)
+    if len(imgs) == 1:
+        return imgs[0]
+
+    layers = []
     for im in imgs:
-        pivot = get_concat_v(pivot, im)
-    return pivot
+        if isinstance(im, PILImage) and im.mode not in ("L", "RGB", "RGBA"):
+            im = im.convert("RGBA")
+        layers.append(rgba_array(np.asarray(im)))
+
+    width = layers[0].shape[1]
+    dst = np.zeros((sum(layer.shape[0] for layer in layers), width, 4), np.uint8)
+
+    top = 0
+    for layer in layers:
+        height = layer.shape[0]
+        dst[top : top + height, : layer.shape[1]] = layer[:, :width]
+        top += height
+
+    if isinstance(imgs[0], np.ndarray):
+        return dst
+    return Image.fromarray(dst)
 
 
 def get_concat_v(img1: PILImage, img2: PILImage) -> PILImage:
@@ -161,17 +395,23 @@ def post_process(mask: np.ndarray) -> np.ndarray:
     return mask
 
 
-def apply_background_color(img: PILImage, color: Tuple[int, int, int, int]) -> PILImage:
+def apply_background_color(
+    img: Union[PILImage, np.ndarray], color: Tuple[int, int, int, int]
+) -> Union[PILImage, np.ndarray]:
     """
     Apply the specified background color to the image.
 
     Args:
-        img (PILImage): The image to be modified.
+        img (Union[PILImage, np.ndarray]): The image to be modified. Arrays give a new (H, W, 4) array.
         color (Tuple[int, int, int, int]): The RGBA color to be applied.
 
     Returns:
-        PILImage: The modified image with the background color applied.
+        Union[PILImage, np.ndarray]: The modified image with the background color applied.
     """
+    if isinstance(img, np.ndarray):
+        img = rgba_array(img)
+        return blend(img, np.array(color, dtype=np.uint32), img[:, :, 3:])
+
     r, g, b, a = color
     colored_image = Image.new("RGBA", img.size, (r, g, b, a))
     colored_image.paste(img, mask=img)
@@ -179,6 +419,54 @@ def apply_background_color(img: PILImage, color: Tuple[int, int, int, int]) -> P
     return colored_image
 
 
+def encode_image(
+    img: Union[PILImage, np.ndarray],
+    output_format: str = "png",
+    png_compress_level: int = 6,
+    webp_quality: int = 90,
+    webp_lossless: bool = True,
+) -> bytes:
+    """
+    Encode an image to bytes in the given output format.
+
+    Args:
+        img (Union[PILImage, np.ndarray]): The image to encode.
+        output_format (str): "png", "webp" or "raw". "raw" returns the uncompressed pixels, RGBA for cutouts
+            and one byte per pixel for masks.
+        png_compress_level (int): The zlib level for PNG, from 0 (fastest, largest) to 9. Defaults to 6.
+        webp_quality (int): The WebP quality, or the compression effort when lossless. Defaults to 90.
+        webp_lossless (bool): Whether WebP is lossless. Defaults to True.
+
+    Returns:
+        bytes: The encoded image.
+
+    Raises:
+        ValueError: If the output format is unknown.
+    """
+    if output_format == "raw":
+        if isinstance(img, np.ndarray):
+            if img.ndim == 3:
+                img = rgba_array(img)
+            return np.ascontiguousarray(img).tobytes()
+        if img.mode not in ("L", "RGBA"):
+            img = img.convert("RGBA")
+        return img.tobytes()
+
+    if isinstance(img, np.ndarray):
+        img = Image.fromarray(img)
+
+    bio = io.BytesIO()
+
+    if output_format == "png":
+        img.save(bio, "PNG", compress_level=png_compress_level)
+    elif output_format == "webp":
+        img.save(bio, "WEBP", quality=webp_quality, lossless=webp_lossless)
+    else:
+        raise ValueError(f"Unknown output_format: {output_format}")
+
+    return bio.getvalue()
+
+
 def fix_image_orientation(img: PILImage) -> PILImage:
     """
     Fix the orientation of the image based on its EXIF data.
@@ -200,6 +488,41 @@ def download_models() -> None:
         session.download_models()
 
 
+def quantize_models(
+    model_names: Optional[List[str]] = None, force: bool = False
+) -> List[str]:
+    """
+    Create int8 dynamic-quantized variants of the models.
+
+    Args:
+        model_names (Optional[List[str]]): The models to quantize. Defaults to every single-model session,
+            which excludes 'sam' (shipped with its own quantized files) and 'u2net_custom'.
+        force (bool): Rebuild variants that already exist.
+
+    Returns:
+        List[str]: The paths of the quantized models.
+    """
+    if not model_names:
+        model_names = [session.name() for session in quantizable_sessions_class()]
+
+    paths = []
+    for session in sessions_class:
+        if session.name() in model_names:
+            paths.append(session.quantize_models(force=force))
+    return paths
+
+
+def quantizable_sessions_class() -> List[type]:
+    """
+    List the session classes that can be quantized with `quantize_models`.
+    """
+    return [
+        session
+        for session in sessions_class
+        if session.name() not in ["sam", "u2net_custom"]
+    ]
+
+
 def remove(
     data: Union[bytes, PILImage, np.ndarray],
     alpha_matting: bool = False,
@@ -235,11 +558,162 @@ def remove(
         post_process_mask (bool, optional): Flag indicating whether to post-process the masks. Defaults to False.
         bgcolor (Optional[Tuple[int, int, int, int]], optional): Background color for the cutout image. Defaults to None.
         *args (Optional[Any]): Additional positional arguments.
-        **kwargs (Optional[Any]): Additional keyword arguments.
+        **kwargs (Optional[Any]): Additional keyword arguments. 'alpha_matting_mode' selects "cf" (full closed-form
+            matting, the default) or "fast" (band-restricted, see `estimate_alpha_fast`), and 'alpha_matting_scale'
+            sets the downscale factor used by the fast mode. Defaults to 1.0. 'stage_callback' is called as
+            `stage_callback(name, seconds, info)` for each processing stage (decode, normalize, inference, mask,
+            mask_resize, postprocess, matting or cutout, composite, encode), where 'info' holds the image "size"
+            the stage worked on. See also `rembg.profiling.profile`. 'output_format' ("png", "webp" or "raw"),
+            'png_compress_level', 'webp_quality' and 'webp_lossless' choose how bytes output is encoded, see
+            `encode_image`. With 'stack_masks', the masks (or cutouts) are returned as one stacked ndarray instead
+            of a tall image.
 
     Returns:
         Union[bytes, PILImage, np.ndarray]: The cutout image with the background removed.
     """
+    putalpha = kwargs.pop("putalpha", False)
+    stack_masks = kwargs.pop("stack_masks", False)
+    alpha_matting_mode = kwargs.pop("alpha_matting_mode", "cf")
+    alpha_matting_scale = kwargs.pop("alpha_matting_scale", 1.0)
+    stage_callback = kwargs.pop("stage_callback", None)
+    encode_options = {
+        name: kwargs.pop(name) for name in ENCODE_OPTIONS if name in kwargs
+    }
+
+    with stage_hook(stage_callback):
+        with stage("decode") as info:
+            img, return_type = load_image(data)
+
+            if return_type != ReturnType.NDARRAY:
+                # Fix image orientation
+                img = fix_image_orientation(img)
+                img.load()
+            info["size"] = img.size
+
+        if session is None:
+            session = new_session("DisSessionGeneralUse", *args, **kwargs)
+
+        masks = session.predict(img, *args, **kwargs)
+
+        return build_output(
+            data if return_type == ReturnType.NDARRAY else img,
+            masks,
+            return_type,
+            alpha_matting,
+            alpha_matting_foreground_threshold,
+            alpha_matting_background_threshold,
+            alpha_matting_erode_size,
+            only_mask,
+            post_process_mask,
+            bgcolor,
+            putalpha,
+            alpha_matting_mode,
+            alpha_matting_scale,
+            encode_options,
+            stack_masks,
+        )
+
+
+def remove_batch(
+    data: List[Union[bytes, PILImage, np.ndarray]],
+    alpha_matting: bool = False,
+    alpha_matting_foreground_threshold: int = 240,
+    alpha_matting_background_threshold: int = 10,
+    alpha_matting_erode_size: int = 10,
+    session: Optional[BaseSession] = None,
+    only_mask: bool = False,
+    post_process_mask: bool = False,
+    bgcolor: Optional[Tuple[int, int, int, int]] = None,
+    *args: Optional[Any],
+    **kwargs: Optional[Any]
+) -> List[Union[bytes, PILImage, np.ndarray]]:
+    """
+    Remove the background from several input images.
+
+    This works like `remove` applied to each item of `data`, except that the masks of all images are
+    predicted together with `session.predict_batch`, so models with a dynamic batch dimension run once
+    for the whole list. Each result has the type of its own input.
+
+    Parameters:
+        data (List[Union[bytes, PILImage, np.ndarray]]): The input images.
+        The remaining parameters are the same as for `remove`.
+
+    Returns:
+        List[Union[bytes, PILImage, np.ndarray]]: The cutout images, in input order.
+    """
+    putalpha = kwargs.pop("putalpha", False)
+    stack_masks = kwargs.pop("stack_masks", False)
+    alpha_matting_mode = kwargs.pop("alpha_matting_mode", "cf")
+    alpha_matting_scale = kwargs.pop("alpha_matting_scale", 1.0)
+    stage_callback = kwargs.pop("stage_callback", None)
+    encode_options = {
+        name: kwargs.pop(name) for name in ENCODE_OPTIONS if name in kwargs
+    }
+
+    with stage_hook(stage_callback):
+        with stage("decode", batch=len(data)) as info:
+            loaded = [load_image(item) for item in data]
+
+            # Fix image orientation
+            imgs = [
+                img if return_type == ReturnType.NDARRAY else fix_image_orientation(img)
+                for img, return_type in loaded
+            ]
+            for img in imgs:
+                img.load()
+            if imgs:
+                info["size"] = imgs[0].size
+
+        if session is None:
+            session = new_session("DisSessionGeneralUse", *args, **kwargs)
+
+        masks_list = session.predict_batch(imgs, *args, **kwargs)
+
+        return [
+            build_output(
+                item if return_type == ReturnType.NDARRAY else img,
+                masks,
+                return_type,
+                alpha_matting,
+                alpha_matting_foreground_threshold,
+                alpha_matting_background_threshold,
+                alpha_matting_erode_size,
+                only_mask,
+                post_process_mask,
+                bgcolor,
+                putalpha,
+                alpha_matting_mode,
+                alpha_matting_scale,
+                encode_options,
+                stack_masks,
+            )
+            for img, masks, item, (_, return_type) in zip(
+                imgs, masks_list, data, loaded
+            )
+        ]
+
+
+def image_size(img: Union[PILImage, np.ndarray]) -> Tuple[int, int]:
+    """
+    Return the (width, height) of a PIL image or an image array.
+    """
+    if isinstance(img, np.ndarray):
+        return img.shape[1], img.shape[0]
+    return img.size
+
+
+def load_image(data: Union[bytes, PILImage, np.ndarray]) -> Tuple[PILImage, ReturnType]:
+    """
+    Convert the input data of `remove` to a PIL image.
+
+    Arrays are wrapped for the session's `predict` only; the cutout itself is built on the original array.
+
+    Args:
+        data (Union[bytes, PILImage, np.ndarray]): The input image data.
+
+    Returns:
+        Tuple[PILImage, ReturnType]: The image and the type the result should be returned as.
+    """
     if isinstance(data, PILImage):
         return_type = ReturnType.PILLOW
         img = data
@@ -252,52 +726,108 @@ def remove(
     else:
         raise ValueError("Input type {} is not supported.".format(type(data)))
 
-    putalpha = kwargs.pop("putalpha", False)
+    return img, return_type
+
+
+def build_output(
+    img: Union[PILImage, np.ndarray],
+    masks: List[PILImage],
+    return_type: ReturnType,
+    alpha_matting: bool,
+    alpha_matting_foreground_threshold: int,
+    alpha_matting_background_threshold: int,
+    alpha_matting_erode_size: int,
+    only_mask: bool,
+    post_process_mask: bool,
+    bgcolor: Optional[Tuple[int, int, int, int]],
+    putalpha: bool,
+    alpha_matting_mode: str = "cf",
+    alpha_matting_scale: float = 1.0,
+    encode_options: Optional[Dict[str, Any]] = None,
+    stack_masks: bool = False,
+) -> Union[bytes, PILImage, np.ndarray]:
+    """
+    Cut out an image with its predicted masks and convert the result to the requested return type.
+
+    Args:
+        img (Union[PILImage, np.ndarray]): The orientation-fixed input image. For an array, the masks, the cutout
+            and the background color are all computed on arrays and an ndarray result is returned without copies.
+        masks (List[PILImage]): The masks predicted for the image.
+        return_type (ReturnType): The type to return the result as.
+        encode_options (Optional[Dict[str, Any]]): The `encode_image` options for bytes output.
+        stack_masks (bool): Whether to return an (N, H, W) array of the masks, or an (N, H, W, 4) array of the
+            cutouts, instead of concatenating them into one tall image.
+        The remaining arguments are the `remove` options of the same name.
 
-    # Fix image orientation
-    img = fix_image_orientation(img)
+    Returns:
+        Union[bytes, PILImage, np.ndarray]: The cutout image.
+    """
+    if alpha_matting and alpha_matting_mode not in ALPHA_MATTING_MODES:
+        raise ValueError(f"Unknown alpha_matting_mode: {alpha_matting_mode}")
 
-    if session is None:
-        session = new_session("DisSessionGeneralUse", *args, **kwargs)
+    encode_options = encode_options or {}
+    if encode_options.get("output_format", "png") not in OUTPUT_FORMATS:
+        raise ValueError(f"Unknown output_format: {encode_options['output_format']}")
 
-    masks = session.predict(img, *args, **kwargs)
+    as_array = isinstance(img, np.ndarray)
     cutouts = []
 
     for mask in masks:
+        if as_array:
+            mask = np.asarray(mask)
+
         if post_process_mask:
-            mask = Image.fromarray(post_process(np.array(mask)))
+            with stage("postprocess", size=image_size(mask)):
+                mask = post_process(np.asarray(mask))
+                if not as_array:
+                    mask = Image.fromarray(mask)
 
         if only_mask:
             cutout = mask
 
         elif alpha_matting:
-            try:
-                cutout = alpha_matting_cutout(
-                    img,
-                    mask,
-                    alpha_matting_foreground_threshold,
-                    alpha_matting_background_threshold,
-                    alpha_matting_erode_size,
-                )
-            except ValueError:
+            with stage("matting", size=image_size(img)):
+                try:
+                    cutout = alpha_matting_cutout(
+                        Image.fromarray(img) if as_array else img,
+                        Image.fromarray(mask) if as_array else mask,
+                        alpha_matting_foreground_threshold,
+                        alpha_matting_background_threshold,
+                        alpha_matting_erode_size,
+                        alpha_matting_mode,
+                        alpha_matting_scale,
+                    )
+                    if as_array:
+                        cutout = np.asarray(cutout)
+                except ValueError:
+                    if putalpha:
+                        cutout = putalpha_cutout(img, mask)
+                    else:
+                        cutout = naive_cutout(img, mask)
+        else:
+            with stage("cutout", size=image_size(img)):
                 if putalpha:
                     cutout = putalpha_cutout(img, mask)
                 else:
                     cutout = naive_cutout(img, mask)
-        else:
-            if putalpha:
-                cutout = putalpha_cutout(img, mask)
-            else:
-                cutout = naive_cutout(img, mask)
 
         cutouts.append(cutout)
 
-    cutout = img
-    if len(cutouts) > 0:
-        cutout = get_concat_v_multi(cutouts)
+    if stack_masks and cutouts:
+        with stage("composite", size=image_size(cutouts[0]), batch=len(cutouts)):
+            layers = [np.asarray(cutout) for cutout in cutouts]
+            if bgcolor is not None and not only_mask:
+                layers = [apply_background_color(layer, bgcolor) for layer in layers]
+            return np.stack(layers)
+
+    with stage("composite") as info:
+        cutout = img
+        if len(cutouts) > 0:
+            cutout = get_concat_v_multi(cutouts)
 
-    if bgcolor is not None and not only_mask:
-        cutout = apply_background_color(cutout, bgcolor)
+        if bgcolor is not None and not only_mask:
+            cutout = apply_background_color(cutout, bgcolor)
+        info["size"] = image_size(cutout)
 
     if ReturnType.PILLOW == return_type:
         return cutout
@@ -305,8 +835,5 @@ def remove(
     if ReturnType.NDARRAY == return_type:
         return np.asarray(cutout)
 
-    bio = io.BytesIO()
-    cutout.save(bio, "PNG")
-    bio.seek(0)
-
-    return bio.read()
+    with stage("encode", size=image_size(cutout)):
+        return encode_image(cutout, **encode_options)
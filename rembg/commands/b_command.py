@@ -1,14 +1,22 @@
 import asyncio
-import io
 import json
 import os
 import sys
+from concurrent.futures import ThreadPoolExecutor
 from typing import IO
 
 import click
-from PIL import Image
+import numpy as np
 
-from ..bg import remove
+from ..bg import (
+    ALPHA_MATTING_MODES,
+    ENCODE_OPTIONS,
+    OUTPUT_FORMATS,
+    encode_image,
+    image_size,
+    remove_batch,
+)
+from ..profiling import Profile, stage, stage_hook
 from ..session_factory import new_session
 from ..sessions import sessions_names
 
@@ -57,6 +65,22 @@ from ..sessions import sessions_names
     show_default=True,
     help="erode size",
 )
+@click.option(
+    "-am",
+    "--alpha-matting-mode",
+    default="cf",
+    type=click.Choice(ALPHA_MATTING_MODES),
+    show_default=True,
+    help="alpha matting solver, 'fast' only solves the trimap band",
+)
+@click.option(
+    "-as",
+    "--alpha-matting-scale",
+    default=1.0,
+    type=click.FloatRange(0, 1, min_open=True),
+    show_default=True,
+    help="downscale factor for the 'fast' alpha matting mode",
+)
 @click.option(
     "-om",
     "--only-mask",
@@ -71,6 +95,37 @@ from ..sessions import sessions_names
     show_default=True,
     help="post process the mask",
 )
+@click.option(
+    "-of",
+    "--output-format",
+    default="png",
+    type=click.Choice(OUTPUT_FORMATS),
+    show_default=True,
+    help="output format, 'raw' writes the uncompressed pixels",
+)
+@click.option(
+    "-pcl",
+    "--png-compress-level",
+    default=6,
+    type=click.IntRange(0, 9),
+    show_default=True,
+    help="png zlib level, lower is faster",
+)
+@click.option(
+    "-wq",
+    "--webp-quality",
+    default=90,
+    type=click.IntRange(0, 100),
+    show_default=True,
+    help="webp quality, or compression effort when lossless",
+)
+@click.option(
+    "-wl/-wy",
+    "--webp-lossless/--webp-lossy",
+    default=True,
+    show_default=True,
+    help="lossless or lossy webp",
+)
 @click.option(
     "-bgc",
     "--bgcolor",
@@ -79,6 +134,30 @@ from ..sessions import sessions_names
     nargs=4,
     help="Background color (R G B A) to replace the removed background with",
 )
+@click.option(
+    "-bs",
+    "--batch-size",
+    default=1,
+    type=click.IntRange(min=1),
+    show_default=True,
+    help="number of frames per model run",
+)
+@click.option(
+    "-qs",
+    "--queue-size",
+    default=4,
+    type=click.IntRange(min=1),
+    show_default=True,
+    help="number of batches and encoded frames buffered between pipeline stages",
+)
+@click.option(
+    "-pf",
+    "--profile",
+    "profiling",
+    is_flag=True,
+    show_default=True,
+    help="print the time spent in each processing stage to stderr at the end of the input",
+)
 @click.option("-x", "--extras", type=str)
 @click.option(
     "-o",
@@ -100,12 +179,17 @@ def b_command(
     image_width: int,
     image_height: int,
     output_specifier: str,
+    batch_size: int,
+    queue_size: int,
+    profiling: bool,
     **kwargs
 ) -> None:
     """
     Command-line interface for processing images by removing the background using a specified model and generating a mask.
 
     This CLI command takes several options and arguments to configure the background removal process and save the processed images.
+    Reading frames, running the model and encoding the output run as overlapping pipeline stages: the model runs in a
+    worker thread and encoding in a thread pool, with bounded queues in between. Outputs keep the input frame order.
 
     Parameters:
         model (str): The name of the model to use for background removal.
@@ -113,6 +197,10 @@ def b_command(
         image_width (int): The width of the input images in pixels.
         image_height (int): The height of the input images in pixels.
         output_specifier (str): A printf-style specifier for the output filenames. If specified, the processed images will be saved to the specified output directory with filenames generated using the specifier.
+        batch_size (int): The number of frames predicted together in one model run.
+        queue_size (int): The number of batches and encoded frames buffered between the pipeline stages.
+        profiling (bool): Whether to print the time spent in each processing stage to stderr at the end of the input,
+            stdout carries the frames.
         **kwargs: Additional keyword arguments that can be used to customize the background removal process.
 
     Returns:
@@ -134,10 +222,27 @@ def b_command(
         if not os.path.isdir(output_dir):
             os.makedirs(output_dir, exist_ok=True)
 
-    def img_to_byte_array(img: Image) -> bytes:
-        buff = io.BytesIO()
-        img.save(buff, format="PNG")
-        return buff.getvalue()
+    encode_options = {
+        name: kwargs[name] for name in ENCODE_OPTIONS if name in kwargs
+    }
+
+    timings = Profile()
+    hook = timings if profiling else None
+
+    def infer_batch(frames):
+        with stage_hook(hook):
+            return remove_batch(frames, session=session, **kwargs)
+
+    def encode(img: np.ndarray, idx: int) -> bytes:
+        with stage_hook(hook), stage("encode", size=image_size(img)):
+            data = encode_image(img, **encode_options)
+
+        if output_specifier:
+            with open(output_specifier % idx, "wb") as f:
+                f.write(data)
+            return b""
+
+        return data
 
     async def connect_stdin_stdout():
         loop = asyncio.get_event_loop()
@@ -153,25 +258,72 @@ def b_command(
         return reader, writer
 
     async def main():
+        loop = asyncio.get_running_loop()
         reader, writer = await connect_stdin_stdout()
 
-        idx = 0
-        while True:
-            try:
-                img_bytes = await reader.readexactly(bytes_per_img)
-                if not img_bytes:
+        batches: asyncio.Queue = asyncio.Queue(maxsize=queue_size)
+        encoded: asyncio.Queue = asyncio.Queue(maxsize=queue_size * batch_size)
+
+        async def read_frames():
+            frames = []
+            eof = False
+            while not eof:
+                try:
+                    img_bytes = await reader.readexactly(bytes_per_img)
+                    if not img_bytes:
+                        eof = True
+                    else:
+                        frames.append(
+                            np.frombuffer(img_bytes, dtype=np.uint8).reshape(
+                                image_height, image_width, 3
+                            )
+                        )
+                except asyncio.IncompleteReadError:
+                    eof = True
+
+                if not frames or (len(frames) < batch_size and not eof):
+                    continue
+
+                await batches.put(frames)
+                frames = []
+
+            await batches.put(None)
+
+        async def infer(infer_pool, encode_pool):
+            idx = 0
+            while True:
+                frames = await batches.get()
+                if frames is None:
                     break
 
-                img = Image.frombytes("RGB", (image_width, image_height), img_bytes)
-                output = remove(img, session=session, **kwargs)
+                outputs = await loop.run_in_executor(infer_pool, infer_batch, frames)
 
-                if output_specifier:
-                    output.save((output_specifier % idx), format="PNG")
-                else:
-                    writer.write(img_to_byte_array(output))
+                for output in outputs:
+                    await encoded.put(
+                        loop.run_in_executor(encode_pool, encode, output, idx)
+                    )
+                    idx += 1
 
-                idx += 1
-            except asyncio.IncompleteReadError:
-                break
+            await encoded.put(None)
+
+        async def write_outputs():
+            while True:
+                output = await encoded.get()
+                if output is None:
+                    break
+
+                data = await output
+                if data:
+                    writer.write(data)
+                    await writer.drain()
+
+        with ThreadPoolExecutor(max_workers=1) as infer_pool:
+            with ThreadPoolExecutor() as encode_pool:
+                await asyncio.gather(
+                    read_frames(), infer(infer_pool, encode_pool), write_outputs()
+                )
 
     asyncio.run(main())
+
+    if profiling:
+        print(timings.summary(), file=sys.stderr)
@@ -4,7 +4,8 @@ from typing import IO
 
 import click
 
-from ..bg import remove
+from ..bg import ALPHA_MATTING_MODES, OUTPUT_FORMATS, remove
+from ..profiling import Profile, stage_hook
 from ..session_factory import new_session
 from ..sessions import sessions_names
 
@@ -53,6 +54,22 @@ from ..sessions import sessions_names
     show_default=True,
     help="erode size",
 )
+@click.option(
+    "-am",
+    "--alpha-matting-mode",
+    default="cf",
+    type=click.Choice(ALPHA_MATTING_MODES),
+    show_default=True,
+    help="alpha matting solver, 'fast' only solves the trimap band",
+)
+@click.option(
+    "-as",
+    "--alpha-matting-scale",
+    default=1.0,
+    type=click.FloatRange(0, 1, min_open=True),
+    show_default=True,
+    help="downscale factor for the 'fast' alpha matting mode",
+)
 @click.option(
     "-om",
     "--only-mask",
@@ -67,6 +84,37 @@ from ..sessions import sessions_names
     show_default=True,
     help="post process the mask",
 )
+@click.option(
+    "-of",
+    "--output-format",
+    default="png",
+    type=click.Choice(OUTPUT_FORMATS),
+    show_default=True,
+    help="output format, 'raw' writes the uncompressed pixels",
+)
+@click.option(
+    "-pcl",
+    "--png-compress-level",
+    default=6,
+    type=click.IntRange(0, 9),
+    show_default=True,
+    help="png zlib level, lower is faster",
+)
+@click.option(
+    "-wq",
+    "--webp-quality",
+    default=90,
+    type=click.IntRange(0, 100),
+    show_default=True,
+    help="webp quality, or compression effort when lossless",
+)
+@click.option(
+    "-wl/-wy",
+    "--webp-lossless/--webp-lossy",
+    default=True,
+    show_default=True,
+    help="lossless or lossy webp",
+)
 @click.option(
     "-bgc",
     "--bgcolor",
@@ -75,6 +123,14 @@ from ..sessions import sessions_names
     nargs=4,
     help="Background color (R G B A) to replace the removed background with",
 )
+@click.option(
+    "-pf",
+    "--profile",
+    "profiling",
+    is_flag=True,
+    show_default=True,
+    help="print the time spent in each processing stage to stderr",
+)
 @click.option("-x", "--extras", type=str)
 @click.argument(
     "input", default=(None if sys.stdin.isatty() else "-"), type=click.File("rb")
@@ -84,7 +140,9 @@ from ..sessions import sessions_names
     default=(None if sys.stdin.isatty() else "-"),
     type=click.File("wb", lazy=True),
 )
-def i_command(model: str, extras: str, input: IO, output: IO, **kwargs) -> None:
+def i_command(
+    model: str, extras: str, input: IO, output: IO, profiling: bool, **kwargs
+) -> None:
     """
     Click command line interface function to process an input file based on the provided options.
 
@@ -95,6 +153,7 @@ def i_command(model: str, extras: str, input: IO, output: IO, **kwargs) -> None:
         extras (str): Additional options in JSON format.
         input: The input file to process.
         output: The output file to write the processed image to.
+        profiling (bool): Whether to print the time spent in each processing stage.
         **kwargs: Additional keyword arguments corresponding to the command line options.
 
     Returns:
@@ -105,4 +164,11 @@ def i_command(model: str, extras: str, input: IO, output: IO, **kwargs) -> None:
     except Exception:
         pass
 
-    output.write(remove(input.read(), session=new_session(model, **kwargs), **kwargs))
+    session = new_session(model, **kwargs)
+
+    timings = Profile()
+    with stage_hook(timings if profiling else None):
+        output.write(remove(input.read(), session=session, **kwargs))
+
+    if profiling:
+        print(timings.summary(), file=sys.stderr)
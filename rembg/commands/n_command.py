@@ -0,0 +1,135 @@
+import json
+import pathlib
+import time
+from typing import Tuple
+
+import click
+import numpy as np
+from PIL import Image
+
+from ..session_factory import new_session
+from ..sessions import sessions_class, sessions_names
+from ..sessions.base import BaseSession
+
+
+@click.command(  # type: ignore
+    name="n",
+    help="benchmark the input normalization of the models",
+)
+@click.option(
+    "-m",
+    "--model",
+    multiple=True,
+    type=click.Choice(sessions_names),
+    show_choices=True,
+    help="model name, repeat for several models (default: all)",
+)
+@click.option(
+    "-r",
+    "--repeat",
+    default=10,
+    type=click.IntRange(min=1),
+    show_default=True,
+    help="number of timed runs per image",
+)
+@click.option("-x", "--extras", type=str)
+@click.argument(
+    "images",
+    nargs=-1,
+    required=True,
+    type=click.Path(
+        exists=True,
+        path_type=pathlib.Path,
+        file_okay=True,
+        dir_okay=False,
+        readable=True,
+    ),
+)
+def n_command(
+    model: Tuple[str, ...],
+    repeat: int,
+    extras: str,
+    images: Tuple[pathlib.Path, ...],
+) -> None:
+    """
+    Command-line interface for benchmarking the lookup table input normalization.
+
+    For every model, `BaseSession.normalize` is timed against the float computation it replaced, with the
+    session's own mean, standard deviation and input size, and both are checked to give identical model
+    inputs. SAM is skipped, its encoder preprocesses the image itself. Sessions that can't be created with
+    the given extras, e.g. 'u2net_custom' without a 'model_path', are skipped with the reason.
+
+    Parameters:
+        model (Tuple[str, ...]): The models to benchmark, all models if empty.
+        repeat (int): The number of timed runs per image.
+        extras (str): Additional session options in JSON format.
+        images (Tuple[pathlib.Path, ...]): The images to benchmark on.
+
+    Returns:
+        None
+    """
+    kwargs = {}
+    if extras:
+        kwargs.update(json.loads(extras))
+
+    pil_images = [Image.open(path).convert("RGB") for path in images]
+
+    print(
+        f"{'model':<20} {'size':>9} {'float ms':>10} {'lut ms':>10} {'speedup':>8} {'identical':>10}"
+    )
+    for session_class in sessions_class:
+        model_name = session_class.name()
+        if model and model_name not in model:
+            continue
+
+        if session_class.normalize is not BaseSession.normalize:
+            print(f"{model_name:<20} skipped, its encoder preprocesses the image")
+            continue
+
+        try:
+            session = new_session(model_name, **kwargs)
+        except ValueError as e:
+            print(f"{model_name:<20} skipped, {e}")
+            continue
+
+        float_ms, lut_ms, identical = _benchmark_normalize(session, pil_images, repeat)
+        size = "x".join(str(value) for value in session.input_size)
+        print(
+            f"{model_name:<20} {size:>9} {float_ms:>10.2f} {lut_ms:>10.2f} {float_ms / lut_ms:>7.2f}x {str(identical):>10}"
+        )
+
+
+def _float_normalize(session: BaseSession, img: Image.Image) -> np.ndarray:
+    # the float computation the lookup tables replace
+    im_ary = session.resize(img.convert("RGB"), session.input_size)
+    im_ary = im_ary / np.max(im_ary)
+
+    tmpImg = np.zeros((im_ary.shape[0], im_ary.shape[1], 3))
+    for c in range(3):
+        tmpImg[:, :, c] = (im_ary[:, :, c] - session.norm_mean[c]) / session.norm_std[c]
+
+    return np.expand_dims(tmpImg.transpose((2, 0, 1)), 0).astype(np.float32)
+
+
+def _lut_normalize(session: BaseSession, img: Image.Image) -> np.ndarray:
+    inputs = session.normalize(
+        img, session.norm_mean, session.norm_std, session.input_size
+    )
+    return next(iter(inputs.values()))
+
+
+def _benchmark_normalize(session: BaseSession, images, repeat: int):
+    identical = all(
+        np.array_equal(_float_normalize(session, img), _lut_normalize(session, img))
+        for img in images
+    )
+
+    timings = []
+    for normalize in [_float_normalize, _lut_normalize]:
+        start = time.perf_counter()
+        for _ in range(repeat):
+            for image in images:
+                normalize(session, image)
+        timings.append((time.perf_counter() - start) * 1000 / (repeat * len(images)))
+
+    return timings[0], timings[1], identical
@@ -1,7 +1,11 @@
 import json
+import multiprocessing
+import os
 import pathlib
+import threading
 import time
-from typing import cast
+from concurrent.futures import Future, ProcessPoolExecutor
+from typing import Any, Dict, List, Optional, Tuple, cast
 
 import click
 import filetype
@@ -9,8 +13,10 @@ from tqdm import tqdm
 from watchdog.events import FileSystemEvent, FileSystemEventHandler
 from watchdog.observers import Observer
 
-from ..bg import remove
-from ..session_factory import new_session
+from ..bg import ALPHA_MATTING_MODES, OUTPUT_FORMATS, remove_batch
+from ..profiling import Profile, stage_hook
+from ..session_factory import load_session_config, new_session
+from ..sessions.base import BaseSession
 from ..sessions import sessions_names
 
 
@@ -58,6 +64,22 @@ from ..sessions import sessions_names
     show_default=True,
     help="erode size",
 )
+@click.option(
+    "-am",
+    "--alpha-matting-mode",
+    default="cf",
+    type=click.Choice(ALPHA_MATTING_MODES),
+    show_default=True,
+    help="alpha matting solver, 'fast' only solves the trimap band",
+)
+@click.option(
+    "-as",
+    "--alpha-matting-scale",
+    default=1.0,
+    type=click.FloatRange(0, 1, min_open=True),
+    show_default=True,
+    help="downscale factor for the 'fast' alpha matting mode",
+)
 @click.option(
     "-om",
     "--only-mask",
@@ -80,6 +102,61 @@ from ..sessions import sessions_names
     show_default=True,
     help="watches a folder for changes",
 )
+@click.option(
+    "-bs",
+    "--batch-size",
+    default=1,
+    type=click.IntRange(min=1),
+    show_default=True,
+    help="number of images per model run",
+)
+@click.option(
+    "-pf",
+    "--profile",
+    "profiling",
+    is_flag=True,
+    show_default=True,
+    help="print the time spent in each processing stage",
+)
+@click.option(
+    "-j",
+    "--workers",
+    default=1,
+    type=click.IntRange(min=1),
+    show_default=True,
+    help="number of worker processes, each with its own model session",
+)
+@click.option(
+    "-of",
+    "--output-format",
+    default="png",
+    type=click.Choice(OUTPUT_FORMATS),
+    show_default=True,
+    help="output format, 'raw' writes the uncompressed pixels",
+)
+@click.option(
+    "-pcl",
+    "--png-compress-level",
+    default=6,
+    type=click.IntRange(0, 9),
+    show_default=True,
+    help="png zlib level, lower is faster",
+)
+@click.option(
+    "-wq",
+    "--webp-quality",
+    default=90,
+    type=click.IntRange(0, 100),
+    show_default=True,
+    help="webp quality, or compression effort when lossless",
+)
+@click.option(
+    "-wl/-wy",
+    "--webp-lossless/--webp-lossy",
+    default=True,
+    show_default=True,
+    help="lossless or lossy webp",
+)
 @click.option(
     "-bgc",
     "--bgcolor",
@@ -115,6 +192,9 @@ def p_command(
     input: pathlib.Path,
     output: pathlib.Path,
     watch: bool,
+    batch_size: int,
+    workers: int,
+    profiling: bool,
     **kwargs,
 ) -> None:
     """
@@ -125,6 +205,12 @@ def p_command(
     Additional options include outputting only the mask and post-processing the mask.
     The program can also watch the input folder for changes and automatically process new images.
     The resulting images with the background removed are saved in the specified output folder.
+    Images whose output is newer than the input are skipped, and files that are not images are counted
+    separately. A batch that fails is retried one image at a time, so only the bad files fail.
+
+    With more than one worker, batches are sent to a pool of processes that each own a model session. At most two
+    batches per worker are queued at a time, and the ONNX Runtime thread count of each worker defaults to its share
+    of the CPU cores.
 
     Parameters:
         model (str): The name of the model to use for background removal.
@@ -132,6 +218,9 @@ def p_command(
         input (pathlib.Path): The path to the input folder.
         output (pathlib.Path): The path to the output folder.
         watch (bool): Whether to watch the input folder for changes.
+        batch_size (int): The number of images predicted together in one model run.
+        workers (int): The number of worker processes.
+        profiling (bool): Whether to print the time spent in each processing stage at the end of the run.
         **kwargs: Additional keyword arguments.
 
     Returns:
@@ -142,60 +231,217 @@ def p_command(
     except Exception:
         pass
 
-    session = new_session(model, **kwargs)
+    suffix = "." + kwargs.get("output_format", "png")
 
-    def process(each_input: pathlib.Path) -> None:
-        try:
-            mimetype = filetype.guess(each_input)
-            if mimetype is None:
-                return
-            if mimetype.mime.find("image") < 0:
-                return
+    executor: Optional[ProcessPoolExecutor] = None
+    session: Optional[BaseSession] = None
 
-            each_output = (output / each_input.name).with_suffix(".png")
-            each_output.parents[0].mkdir(parents=True, exist_ok=True)
+    if workers > 1:
+        if "OMP_NUM_THREADS" not in os.environ and (
+            "intra_op_num_threads" not in load_session_config(**kwargs)
+        ):
+            kwargs["session_options"] = {
+                **(kwargs.get("session_options") or {}),
+                "intra_op_num_threads": max((os.cpu_count() or 1) // workers, 1),
+            }
+
+        executor = ProcessPoolExecutor(
+            max_workers=workers,
+            mp_context=multiprocessing.get_context("spawn"),
+            initializer=_init_worker,
+            initargs=(model, kwargs),
+        )
+    else:
+        session = new_session(model, **kwargs)
 
-            if not each_output.exists():
-                each_output.write_bytes(
-                    cast(
-                        bytes,
-                        remove(each_input.read_bytes(), session=session, **kwargs),
-                    )
+    slots = threading.BoundedSemaphore(2 * workers)
+    lock = threading.Lock()
+    stats = {"processed": 0, "skipped": 0, "not_images": 0, "failed": 0}
+    timings = Profile()
+
+    def collect(
+        batch: List[Tuple[pathlib.Path, pathlib.Path]],
+        processed: List[Tuple[pathlib.Path, pathlib.Path]],
+        records: Optional[List] = None,
+    ) -> None:
+        with lock:
+            stats["processed"] += len(processed)
+            stats["failed"] += len(batch) - len(processed)
+            timings.records.extend(records or [])
+
+        if watch:
+            for each_input, each_output in processed:
+                print(
+                    f"processed: {each_input.absolute()} -> {each_output.absolute()}"
                 )
 
-                if watch:
-                    print(
-                        f"processed: {each_input.absolute()} -> {each_output.absolute()}"
-                    )
+    def submit(batch: List[Tuple[pathlib.Path, pathlib.Path]]) -> None:
+        if executor is None:
+            collect(*_process_batch(batch, kwargs, profiling, session))
+            return
+
+        def on_done(future: Future) -> None:
+            slots.release()
+            try:
+                collect(*future.result())
+            except Exception as e:
+                print(e)
+                collect(batch, [])
+
+        slots.acquire()
+        future = executor.submit(_process_batch, batch, kwargs, profiling)
+        future.add_done_callback(on_done)
+
+    def process(each_input: pathlib.Path) -> None:
+        try:
+            if not _is_image(each_input):
+                return
+            each_output = _output_for(each_input, output, suffix)
+            if each_output is None:
+                return
         except Exception as e:
             print(e)
+            return
+
+        submit([(each_input, each_output)])
+
+    start = time.perf_counter()
 
     inputs = list(input.glob("**/*"))
     if not watch:
         inputs = tqdm(inputs)
 
+    batch: List[Tuple[pathlib.Path, pathlib.Path]] = []
     for each_input in inputs:
-        if not each_input.is_dir():
-            process(each_input)
+        if each_input.is_dir():
+            continue
 
-    if watch:
-        observer = Observer()
+        try:
+            if not _is_image(each_input):
+                stats["not_images"] += 1
+                continue
+            each_output = _output_for(each_input, output, suffix)
+        except Exception as e:
+            print(e)
+            continue
 
-        class EventHandler(FileSystemEventHandler):
-            def on_any_event(self, event: FileSystemEvent) -> None:
-                if not (
-                    event.is_directory or event.event_type in ["deleted", "closed"]
-                ):
-                    process(pathlib.Path(event.src_path))
+        if each_output is None:
+            stats["skipped"] += 1
+        else:
+            batch.append((each_input, each_output))
 
-        event_handler = EventHandler()
-        observer.schedule(event_handler, input, recursive=False)
-        observer.start()
+        if len(batch) >= batch_size:
+            submit(batch)
+            batch = []
 
-        try:
-            while True:
-                time.sleep(1)
+    if batch:
+        submit(batch)
+
+    if not watch:
+        if executor is not None:
+            executor.shutdown()
+
+        elapsed = time.perf_counter() - start
+        print(
+            f"processed: {stats['processed']}, skipped (up to date): {stats['skipped']}, "
+            f"not images: {stats['not_images']}, failed: {stats['failed']} "
+            f"in {elapsed:.1f}s ({stats['processed'] / max(elapsed, 1e-9):.2f} images/s)"
+        )
+        if profiling:
+            print(timings.summary())
+        return
+
+    observer = Observer()
+
+    class EventHandler(FileSystemEventHandler):
+        def on_any_event(self, event: FileSystemEvent) -> None:
+            if not (event.is_directory or event.event_type in ["deleted", "closed"]):
+                process(pathlib.Path(event.src_path))
+
+    event_handler = EventHandler()
+    observer.schedule(event_handler, input, recursive=False)
+    observer.start()
+
+    try:
+        while True:
+            time.sleep(1)
+
+    finally:
+        observer.stop()
+        observer.join()
+
+        if executor is not None:
+            executor.shutdown()
+
+
+_worker_session: Optional[BaseSession] = None
+
+
+def _init_worker(model: str, kwargs: Dict[str, Any]) -> None:
+    global _worker_session
+    _worker_session = new_session(model, **kwargs)
+
+
+def _is_image(each_input: pathlib.Path) -> bool:
+    mimetype = filetype.guess(each_input)
+    return mimetype is not None and mimetype.mime.find("image") >= 0
+
+
+def _output_for(
+    each_input: pathlib.Path, output: pathlib.Path, suffix: str = ".png"
+) -> Optional[pathlib.Path]:
+    # None if the output is already newer than the input
+    each_output = (output / each_input.name).with_suffix(suffix)
+    if each_output.exists() and (
+        each_output.stat().st_mtime >= each_input.stat().st_mtime
+    ):
+        return None
+
+    return each_output
+
+
+def _process_batch(
+    batch: List[Tuple[pathlib.Path, pathlib.Path]],
+    kwargs: Dict[str, Any],
+    profiling: bool = False,
+    session: Optional[BaseSession] = None,
+) -> Tuple[
+    List[Tuple[pathlib.Path, pathlib.Path]],
+    List[Tuple[pathlib.Path, pathlib.Path]],
+    List,
+]:
+    timings = Profile()
+
+    with stage_hook(timings if profiling else None):
+        processed = _remove_files(batch, kwargs, session or _worker_session)
+
+    return batch, processed, timings.records
+
+
+def _remove_files(
+    batch: List[Tuple[pathlib.Path, pathlib.Path]],
+    kwargs: Dict[str, Any],
+    session: Optional[BaseSession],
+) -> List[Tuple[pathlib.Path, pathlib.Path]]:
+    try:
+        results = remove_batch(
+            [each_input.read_bytes() for each_input, _ in batch],
+            session=session,
+            **kwargs,
+        )
+
+        for each_input, each_output in batch:
+            each_output.parents[0].mkdir(parents=True, exist_ok=True)
+        for (_, each_output), result in zip(batch, results):
+            each_output.write_bytes(cast(bytes, result))
+    except Exception as e:
+        if len(batch) > 1:
+            # retry one by one so a single bad file only fails itself
+            return [
+                each for item in batch for each in _remove_files([item], kwargs, session)
+            ]
+
+        print(f"{batch[0][0]}: {e}")
+        return []
 
-        finally:
-            observer.stop()
-            observer.join()
+    return batch
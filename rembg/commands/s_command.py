@@ -1,22 +1,375 @@
+import asyncio
+import functools
+import hashlib
 import json
+import logging
 import os
+import pathlib
+import threading
+import time
 import webbrowser
-from typing import Optional, Tuple, cast
+from collections import OrderedDict, defaultdict
+from typing import Any, Callable, Dict, Hashable, List, Optional, Set, Tuple, cast
 
 import aiohttp
 import click
 import gradio as gr
 import uvicorn
 from asyncer import asyncify
-from fastapi import Depends, FastAPI, File, Form, Query
+from fastapi import Depends, FastAPI, File, Form, HTTPException, Query
 from fastapi.middleware.cors import CORSMiddleware
 from starlette.responses import Response
 
 from .._version import get_versions
-from ..bg import remove
-from ..session_factory import new_session
+from ..bg import remove, remove_batch
+from ..session_factory import SessionManager
 from ..sessions import sessions_names
-from ..sessions.base import BaseSession
+
+logger = logging.getLogger(__name__)
+
+
+class MicroBatcher:
+    """
+    Collects concurrent requests with the same key and runs them as one batch.
+
+    A batch is run as soon as it holds `max_batch_size` items, or `max_wait` seconds after its
+    first item arrived. `run_batch(context, items)` is called in a worker thread with the context
+    of the first request and must return one result per item. If a batch fails, its items are
+    retried one by one so a single bad input only fails its own request.
+
+    `len()` is the number of submitted items whose result is not ready yet, whether they wait for
+    their batch, for a worker thread or are being processed.
+    """
+
+    def __init__(
+        self,
+        run_batch: Callable[[Any, List[Any]], List[Any]],
+        max_batch_size: int = 1,
+        max_wait: float = 0.01,
+    ):
+        self.run_batch = run_batch
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait
+        self.pending: Dict[Hashable, Tuple[Any, List[Tuple[Any, asyncio.Future]]]] = {}
+        self.timers: Dict[Hashable, asyncio.TimerHandle] = {}
+        self.tasks: Set[asyncio.Task] = set()
+        self.in_flight = 0
+
+    async def submit(self, key: Hashable, item: Any, context: Any) -> Any:
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+
+        _, batch = self.pending.setdefault(key, (context, []))
+        batch.append((item, future))
+
+        if len(batch) >= self.max_batch_size:
+            self.flush(key)
+        elif len(batch) == 1:
+            self.timers[key] = loop.call_later(self.max_wait, self.flush, key)
+
+        self.in_flight += 1
+        try:
+            return await future
+        finally:
+            self.in_flight -= 1
+
+    def flush(self, key: Hashable) -> None:
+        timer = self.timers.pop(key, None)
+        if timer is not None:
+            timer.cancel()
+
+        if key in self.pending:
+            context, batch = self.pending.pop(key)
+            task = asyncio.ensure_future(self.run(context, batch))
+            self.tasks.add(task)
+            task.add_done_callback(self.tasks.discard)
+
+    async def run(self, context: Any, batch: List[Tuple[Any, asyncio.Future]]) -> None:
+        items = [item for item, _ in batch]
+
+        try:
+            results = await asyncify(self.run_batch)(context, items)
+        except Exception as e:
+            if len(batch) > 1:
+                await asyncio.gather(*(self.run(context, [each]) for each in batch))
+                return
+
+            results = [e]
+
+        for (_, future), result in zip(batch, results):
+            if future.done():
+                continue
+            if isinstance(result, Exception):
+                future.set_exception(result)
+            else:
+                future.set_result(result)
+
+    def __len__(self) -> int:
+        return self.in_flight
+
+
+def escape_label(value: str) -> str:
+    """
+    Escape a Prometheus label value.
+    """
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+class Metrics:
+    """
+    Request counters and latency histograms, rendered in the Prometheus text format.
+
+    Requests are counted per model and status. Latencies are observed per model and stage, where the
+    stages are the ones reported by `remove` plus "request" for the whole request. Models that
+    are not in `models` are recorded as "unknown", so clients can't create new series.
+    """
+
+    buckets = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+    def __init__(self, models: List[str]):
+        self.models = frozenset(models)
+        self.lock = threading.Lock()
+        self.requests: Dict[Tuple[str, str], int] = defaultdict(int)
+        self.latencies: Dict[Tuple[str, str], List[float]] = {}
+
+    def model_label(self, model: str) -> str:
+        return model if model in self.models else "unknown"
+
+    def count_request(self, model: str, status: str) -> None:
+        with self.lock:
+            self.requests[(self.model_label(model), status)] += 1
+
+    def observe(
+        self,
+        model: str,
+        stage: str,
+        seconds: float,
+        info: Optional[Dict[str, Any]] = None,
+    ) -> None:
+        with self.lock:
+            # one count per bucket, then the sum and the total count
+            values = self.latencies.setdefault(
+                (self.model_label(model), stage), [0.0] * (len(self.buckets) + 2)
+            )
+            for i, bound in enumerate(self.buckets):
+                if seconds <= bound:
+                    values[i] += 1
+            values[-2] += seconds
+            values[-1] += 1
+
+    def render(self, gauges: Dict[str, float]) -> str:
+        lines = [
+            "# HELP rembg_requests_total Number of background removal requests.",
+            "# TYPE rembg_requests_total counter",
+        ]
+
+        with self.lock:
+            for (model, status), count in sorted(self.requests.items()):
+                labels = f'model="{escape_label(model)}",status="{escape_label(status)}"'
+                lines.append(f"rembg_requests_total{{{labels}}} {count}")
+
+            lines += [
+                "# HELP rembg_stage_seconds Latency of the processing stages.",
+                "# TYPE rembg_stage_seconds histogram",
+            ]
+            for (model, stage), values in sorted(self.latencies.items()):
+                labels = f'model="{escape_label(model)}",stage="{escape_label(stage)}"'
+                for bound, count in zip(self.buckets, values):
+                    lines.append(
+                        f'rembg_stage_seconds_bucket{{{labels},le="{bound}"}} {count:g}'
+                    )
+                lines += [
+                    f'rembg_stage_seconds_bucket{{{labels},le="+Inf"}} {values[-1]:g}',
+                    f"rembg_stage_seconds_sum{{{labels}}} {values[-2]}",
+                    f"rembg_stage_seconds_count{{{labels}}} {values[-1]:g}",
+                ]
+
+        for name, value in gauges.items():
+            lines += [f"# TYPE {name} gauge", f"{name} {value:g}"]
+
+        return "\n".join(lines) + "\n"
+
+
+def resident_memory_bytes() -> int:
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, AttributeError):
+        import resource
+
+        # ru_maxrss is the peak, in kilobytes on Linux and bytes on macOS
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+
+class ResultCache:
+    """
+    Content-addressed cache of encoded results.
+
+    Entries are keyed by the SHA-256 of the input bytes and the request parameters. The memory tier
+    is an LRU bounded to `max_bytes`; when `cache_dir` is set, results are also written there and
+    read back on a memory miss, so they survive restarts. The disk tier is an LRU bounded to
+    `max_disk_bytes`, seeded from the existing files oldest first. Failed disk writes are logged and
+    counted, never raised. Hits, misses and write errors are counted in `stats`.
+    """
+
+    def __init__(
+        self,
+        max_bytes: int,
+        cache_dir: Optional[pathlib.Path] = None,
+        max_disk_bytes: int = 1024 * 1024 * 1024,
+    ):
+        self.max_bytes = max_bytes
+        self.cache_dir = cache_dir
+        self.max_disk_bytes = max_disk_bytes
+        self.entries: "OrderedDict[str, bytes]" = OrderedDict()
+        self.size = 0
+        self.disk_entries: "OrderedDict[str, int]" = OrderedDict()
+        self.disk_size = 0
+        self.lock = threading.Lock()
+        self.stats = {"hits": 0, "disk_hits": 0, "misses": 0, "write_errors": 0}
+
+        if self.cache_dir is not None:
+            self.cache_dir.mkdir(parents=True, exist_ok=True)
+
+            files = []
+            for path in self.cache_dir.glob("*.bin"):
+                stat = path.stat()
+                files.append((stat.st_mtime, path.stem, stat.st_size))
+            for _, key, size in sorted(files):
+                self.disk_entries[key] = size
+                self.disk_size += size
+            self.remove_files(self.evict_disk())
+
+    @staticmethod
+    def key(content: bytes, params: Any) -> str:
+        digest = hashlib.sha256(content)
+        digest.update(json.dumps(params, sort_keys=True, default=str).encode())
+        return digest.hexdigest()
+
+    def path(self, key: str) -> pathlib.Path:
+        return cast(pathlib.Path, self.cache_dir) / f"{key}.bin"
+
+    def get(self, key: str) -> Optional[bytes]:
+        with self.lock:
+            value = self.entries.get(key)
+            if value is not None:
+                self.entries.move_to_end(key)
+                self.stats["hits"] += 1
+                return value
+
+            on_disk = key in self.disk_entries
+            if on_disk:
+                self.disk_entries.move_to_end(key)
+
+        if on_disk:
+            try:
+                value = self.path(key).read_bytes()
+            except OSError:
+                value = None
+
+            if value is not None:
+                with self.lock:
+                    self.stats["disk_hits"] += 1
+                self.put(key, value, persist=False)
+                return value
+
+        with self.lock:
+            self.stats["misses"] += 1
+        return None
+
+    def put(self, key: str, value: bytes, persist: bool = True) -> None:
+        if persist and self.cache_dir is not None:
+            self.put_disk(key, value)
+
+        if len(value) > self.max_bytes:
+            return
+
+        with self.lock:
+            if key in self.entries:
+                self.size -= len(self.entries.pop(key))
+
+            self.entries[key] = value
+            self.size += len(value)
+
+            while self.size > self.max_bytes:
+                _, evicted = self.entries.popitem(last=False)
+                self.size -= len(evicted)
+
+    def put_disk(self, key: str, value: bytes) -> None:
+        if len(value) > self.max_disk_bytes:
+            return
+
+        path = self.path(key)
+        try:
+            path.write_bytes(value)
+        except OSError as e:
+            # a cache failure must never fail the request that produced the result
+            logger.warning("result cache write to %s failed: %s", path, e)
+            with self.lock:
+                self.stats["write_errors"] += 1
+            self.remove_files([path])
+            return
+
+        with self.lock:
+            if key in self.disk_entries:
+                self.disk_size -= self.disk_entries.pop(key)
+
+            self.disk_entries[key] = len(value)
+            self.disk_size += len(value)
+            evicted = self.evict_disk()
+
+        self.remove_files(evicted)
+
+    def evict_disk(self) -> List[pathlib.Path]:
+        # called with the lock held, or before the cache is shared
+        evicted = []
+        while self.disk_size > self.max_disk_bytes:
+            key, size = self.disk_entries.popitem(last=False)
+            self.disk_size -= size
+            evicted.append(self.path(key))
+        return evicted
+
+    @staticmethod
+    def remove_files(paths: List[pathlib.Path]) -> None:
+        for path in paths:
+            try:
+                path.unlink()
+            except OSError:
+                pass
+
+    def __len__(self) -> int:
+        return len(self.entries)
+
+
+async def fetch_image(
+    client: aiohttp.ClientSession, url: str, max_size: int
+) -> bytes:
+    """
+    Download the image at `url` with a shared client, streaming the body in chunks.
+
+    Raises an HTTPException with status 413 as soon as the body is larger than `max_size` bytes,
+    and with status 400 when the request fails, times out or returns an error status.
+    """
+    try:
+        async with client.get(url) as response:
+            if response.status >= 400:
+                raise HTTPException(
+                    status_code=400,
+                    detail=f"Failed to fetch image: upstream status {response.status}",
+                )
+
+            if (response.content_length or 0) > max_size:
+                raise HTTPException(status_code=413, detail="Image too large")
+
+            content = bytearray()
+            async for chunk in response.content.iter_chunked(64 * 1024):
+                content.extend(chunk)
+                if len(content) > max_size:
+                    raise HTTPException(status_code=413, detail="Image too large")
+
+            return bytes(content)
+    except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+        raise HTTPException(status_code=400, detail=f"Failed to fetch image: {e!r}")
 
 
 @click.command(  # type: ignore
@@ -55,14 +408,113 @@ from ..sessions.base import BaseSession
     show_default=True,
     help="number of worker threads",
 )
-def s_command(port: int, host: str, log_level: str, threads: int) -> None:
+@click.option(
+    "-pw",
+    "--prewarm",
+    multiple=True,
+    type=click.Choice(sessions_names),
+    show_choices=True,
+    help="model to load at startup, repeat for several models",
+)
+@click.option(
+    "-ms",
+    "--max-sessions",
+    default=8,
+    type=click.IntRange(min=1),
+    show_default=True,
+    help="max number of model sessions kept loaded",
+)
+@click.option(
+    "-mbs",
+    "--max-batch-size",
+    default=1,
+    type=click.IntRange(min=1),
+    show_default=True,
+    help="max number of concurrent requests run as one batch",
+)
+@click.option(
+    "-mbw",
+    "--max-batch-wait",
+    default=10.0,
+    type=click.FloatRange(min=0),
+    show_default=True,
+    help="max milliseconds a request waits for its batch to fill",
+)
+@click.option(
+    "-ft",
+    "--fetch-timeout",
+    default=30.0,
+    type=click.FloatRange(min=0),
+    show_default=True,
+    help="timeout in seconds for fetching an image by URL",
+)
+@click.option(
+    "-fs",
+    "--max-fetch-size",
+    default=20,
+    type=click.IntRange(min=1),
+    show_default=True,
+    help="max size in MB of an image fetched by URL",
+)
+@click.option(
+    "-cs",
+    "--cache-size",
+    default=128,
+    type=click.IntRange(min=0),
+    show_default=True,
+    help="size in MB of the in-memory result cache, 0 to disable caching",
+)
+@click.option(
+    "-cd",
+    "--cache-dir",
+    default=None,
+    type=click.Path(
+        path_type=pathlib.Path,
+        file_okay=False,
+        dir_okay=True,
+        writable=True,
+    ),
+    help="folder for a persistent result cache",
+)
+@click.option(
+    "-cds",
+    "--cache-dir-size",
+    default=1024,
+    type=click.IntRange(min=1),
+    show_default=True,
+    help="size in MB of the persistent result cache, the least recently used results are removed",
+)
+def s_command(
+    port: int,
+    host: str,
+    log_level: str,
+    threads: int,
+    prewarm: Tuple[str, ...],
+    max_sessions: int,
+    max_batch_size: int,
+    max_batch_wait: float,
+    fetch_timeout: float,
+    max_fetch_size: int,
+    cache_size: int,
+    cache_dir: Optional[pathlib.Path],
+    cache_dir_size: int,
+) -> None:
     """
     Command-line interface for running the FastAPI web server.
 
     This function starts the FastAPI web server with the specified port and log level.
     If the number of worker threads is specified, it sets the thread limiter accordingly.
+    Sessions are created once per model and session options and shared between requests, at most
+    '--max-sessions' are kept; the models given with '--prewarm' are loaded at startup. Concurrent
+    API requests with the same parameters are run as one batch of up to '--max-batch-size' images, waiting at most '--max-batch-wait'
+    milliseconds for the batch to fill. Images requested by URL are fetched with one pooled HTTP
+    client, limited by '--fetch-timeout' and '--max-fetch-size'. Results are cached by image digest
+    and parameters, in memory up to '--cache-size' MB and optionally in '--cache-dir', up to
+    '--cache-dir-size' MB. Request counts, stage latencies, queue depth, session count and memory are
+    exposed at '/metrics'.
     """
-    sessions: dict[str, BaseSession] = {}
+    sessions = SessionManager(max_sessions)
+    metrics = Metrics(sessions_names)
     tags_metadata = [
         {
             "name": "Background Removal",
@@ -103,7 +555,7 @@ def s_command(port: int, host: str, log_level: str, threads: int) -> None:
             self,
             model: str = Query(
                 description="Model to use when processing image",
-                regex=r"(" + "|".join(sessions_names) + ")",
+                regex=r"^(" + "|".join(sessions_names) + ")$",
                 default="u2net",
             ),
             a: bool = Query(default=False, description="Enable Alpha Matting"),
@@ -124,6 +576,16 @@ def s_command(port: int, host: str, log_level: str, threads: int) -> None:
             ),
             om: bool = Query(default=False, description="Only Mask"),
             ppm: bool = Query(default=False, description="Post Process Mask"),
+            of: str = Query(
+                default="png",
+                regex=r"^(png|webp)$",
+                description="Output Format",
+            ),
+            cl: int = Query(
+                default=6, ge=0, le=9, description="PNG Compression Level"
+            ),
+            wq: int = Query(default=90, ge=0, le=100, description="WebP Quality"),
+            wl: bool = Query(default=True, description="WebP Lossless"),
             bgc: Optional[str] = Query(default=None, description="Background Color"),
             extras: Optional[str] = Query(
                 default=None, description="Extra parameters as JSON"
@@ -136,6 +598,10 @@ def s_command(port: int, host: str, log_level: str, threads: int) -> None:
             self.ae = ae
             self.om = om
             self.ppm = ppm
+            self.of = of
+            self.cl = cl
+            self.wq = wq
+            self.wl = wl
             self.extras = extras
             self.bgc = (
                 cast(Tuple[int, int, int, int], tuple(map(int, bgc.split(","))))
@@ -148,7 +614,7 @@ def s_command(port: int, host: str, log_level: str, threads: int) -> None:
             self,
             model: str = Form(
                 description="Model to use when processing image",
-                regex=r"(" + "|".join(sessions_names) + ")",
+                regex=r"^(" + "|".join(sessions_names) + ")$",
                 default="u2net",
             ),
             a: bool = Form(default=False, description="Enable Alpha Matting"),
@@ -169,6 +635,16 @@ def s_command(port: int, host: str, log_level: str, threads: int) -> None:
             ),
             om: bool = Form(default=False, description="Only Mask"),
             ppm: bool = Form(default=False, description="Post Process Mask"),
+            of: str = Form(
+                default="png",
+                regex=r"^(png|webp)$",
+                description="Output Format",
+            ),
+            cl: int = Form(
+                default=6, ge=0, le=9, description="PNG Compression Level"
+            ),
+            wq: int = Form(default=90, ge=0, le=100, description="WebP Quality"),
+            wl: bool = Form(default=True, description="WebP Lossless"),
             bgc: Optional[str] = Query(default=None, description="Background Color"),
             extras: Optional[str] = Query(
                 default=None, description="Extra parameters as JSON"
@@ -181,6 +657,10 @@ def s_command(port: int, host: str, log_level: str, threads: int) -> None:
             self.ae = ae
             self.om = om
             self.ppm = ppm
+            self.of = of
+            self.cl = cl
+            self.wq = wq
+            self.wl = wl
             self.extras = extras
             self.bgc = (
                 cast(Tuple[int, int, int, int], tuple(map(int, bgc.split(","))))
@@ -188,7 +668,9 @@ def s_command(port: int, host: str, log_level: str, threads: int) -> None:
                 else None
             )
 
-    def im_without_bg(content: bytes, commons: CommonQueryParams) -> Response:
+    def remove_images(
+        commons: CommonQueryParams, contents: List[bytes]
+    ) -> List[Response]:
         kwargs = {}
 
         if commons.extras:
@@ -197,12 +679,11 @@ def s_command(port: int, host: str, log_level: str, threads: int) -> None:
             except Exception:
                 pass
 
-        return Response(
-            remove(
-                content,
-                session=sessions.setdefault(
-                    commons.model, new_session(commons.model, **kwargs)
-                ),
+        return [
+            Response(cast(bytes, output), media_type=f"image/{commons.of}")
+            for output in remove_batch(
+                contents,
+                session=sessions.get(commons.model, **kwargs),
                 alpha_matting=commons.a,
                 alpha_matting_foreground_threshold=commons.af,
                 alpha_matting_background_threshold=commons.ab,
@@ -210,10 +691,66 @@ def s_command(port: int, host: str, log_level: str, threads: int) -> None:
                 only_mask=commons.om,
                 post_process_mask=commons.ppm,
                 bgcolor=commons.bgc,
+                output_format=commons.of,
+                png_compress_level=commons.cl,
+                webp_quality=commons.wq,
+                webp_lossless=commons.wl,
+                stage_callback=functools.partial(metrics.observe, commons.model),
                 **kwargs,
-            ),
-            media_type="image/png",
+            )
+        ]
+
+    batcher = MicroBatcher(remove_images, max_batch_size, max_batch_wait / 1000)
+    cache = (
+        ResultCache(cache_size * 1024 * 1024, cache_dir, cache_dir_size * 1024 * 1024)
+        if cache_size or cache_dir
+        else None
+    )
+
+    async def im_without_bg(content: bytes, commons: CommonQueryParams) -> Response:
+        start = time.perf_counter()
+        status = "error"
+
+        try:
+            response = await cached_im_without_bg(content, commons)
+            status = "hit" if response.headers.get("X-Cache") == "HIT" else "ok"
+            return response
+        finally:
+            metrics.count_request(commons.model, status)
+            metrics.observe(commons.model, "request", time.perf_counter() - start)
+
+    async def cached_im_without_bg(
+        content: bytes, commons: CommonQueryParams
+    ) -> Response:
+        key = (
+            commons.model,
+            commons.a,
+            commons.af,
+            commons.ab,
+            commons.ae,
+            commons.om,
+            commons.ppm,
+            commons.bgc,
+            commons.of,
+            commons.cl,
+            commons.wq,
+            commons.wl,
+            commons.extras,
         )
+        if cache is None:
+            return await batcher.submit(key, content, commons)
+
+        cache_key = cache.key(content, key)
+        cached = await asyncify(cache.get)(cache_key)
+        if cached is not None:
+            return Response(
+                cached, media_type=f"image/{commons.of}", headers={"X-Cache": "HIT"}
+            )
+
+        response = await batcher.submit(key, content, commons)
+        await asyncify(cache.put)(cache_key, response.body)
+        response.headers["X-Cache"] = "MISS"
+        return response
 
     @app.on_event("startup")
     def startup():
@@ -228,6 +765,24 @@ def s_command(port: int, host: str, log_level: str, threads: int) -> None:
 
             RunVar("_default_thread_limiter").set(CapacityLimiter(threads))
 
+        sessions.prewarm(prewarm)
+
+    http_client: Dict[str, aiohttp.ClientSession] = {}
+
+    @app.on_event("startup")
+    async def open_http_client():
+        http_client["session"] = aiohttp.ClientSession(
+            connector=aiohttp.TCPConnector(
+                limit=100, ttl_dns_cache=300, keepalive_timeout=30
+            ),
+            timeout=aiohttp.ClientTimeout(total=fetch_timeout),
+        )
+
+    @app.on_event("shutdown")
+    async def close_http_client():
+        if "session" in http_client:
+            await http_client.pop("session").close()
+
     @app.get(
         path="/api/remove",
         tags=["Background Removal"],
@@ -240,10 +795,46 @@ def s_command(port: int, host: str, log_level: str, threads: int) -> None:
         ),
         commons: CommonQueryParams = Depends(),
     ):
-        async with aiohttp.ClientSession() as session:
-            async with session.get(url) as response:
-                file = await response.read()
-                return await asyncify(im_without_bg)(file, commons)
+        file = await fetch_image(
+            http_client["session"], url, max_fetch_size * 1024 * 1024
+        )
+        return await im_without_bg(file, commons)
+
+    @app.get(path="/metrics", include_in_schema=False)
+    async def get_metrics():
+        gauges = {
+            "rembg_queue_depth": len(batcher),
+            "rembg_sessions": len(sessions),
+            "rembg_process_resident_memory_bytes": resident_memory_bytes(),
+        }
+        if cache is not None:
+            gauges["rembg_cache_entries"] = len(cache)
+            gauges["rembg_cache_bytes"] = cache.size
+            if cache.cache_dir is not None:
+                gauges["rembg_cache_disk_bytes"] = cache.disk_size
+
+        return Response(
+            metrics.render(gauges), media_type="text/plain; version=0.0.4"
+        )
+
+    @app.get(
+        path="/api/cache",
+        tags=["Background Removal"],
+        summary="Result Cache Stats",
+        description="Returns the hit and miss counts of the result cache.",
+    )
+    async def get_cache_stats():
+        if cache is None:
+            return {"enabled": False}
+
+        return {
+            "enabled": True,
+            "entries": len(cache),
+            "bytes": cache.size,
+            "disk_entries": len(cache.disk_entries),
+            "disk_bytes": cache.disk_size,
+            **cache.stats,
+        }
 
     @app.post(
         path="/api/remove",
@@ -258,7 +849,7 @@ def s_command(port: int, host: str, log_level: str, threads: int) -> None:
         ),
         commons: CommonQueryPostParams = Depends(),
     ):
-        return await asyncify(im_without_bg)(file, commons)  # type: ignore
+        return await im_without_bg(file, commons)  # type: ignore
 
     def gr_app(app):
         def inference(input_path, model, *args):
@@ -274,9 +865,9 @@ def s_command(port: int, host: str, log_level: str, threads: int) -> None:
                 "post_process_mask": ppm,
             }
 
-            if cmd_args:
-                kwargs.update(json.loads(cmd_args))
-            kwargs["session"] = new_session(model, **kwargs)
+            extras = json.loads(cmd_args) if cmd_args else {}
+            kwargs.update(extras)
+            kwargs["session"] = sessions.get(model, **extras)
 
             with open(input_path, "rb") as i:
                 with open(output_path, "wb") as o:
@@ -0,0 +1,100 @@
+import time
+from collections import defaultdict
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Any, Callable, Dict, Iterator, List, Optional, Tuple
+
+StageCallback = Callable[[str, float, Dict[str, Any]], None]
+
+stage_callback: ContextVar[Optional[StageCallback]] = ContextVar(
+    "stage_callback", default=None
+)
+
+
+@contextmanager
+def stage_hook(callback: Optional[StageCallback]) -> Iterator[None]:
+    """
+    Report the stages run inside the block to `callback(name, seconds, info)`.
+
+    Does nothing if `callback` is None, so an outer hook stays in place.
+    """
+    if callback is None:
+        yield
+        return
+
+    token = stage_callback.set(callback)
+    try:
+        yield
+    finally:
+        stage_callback.reset(token)
+
+
+@contextmanager
+def stage(name: str, **info: Any) -> Iterator[Dict[str, Any]]:
+    """
+    Time the block as the stage `name` if a hook is installed, see `stage_hook`.
+
+    The block gets the `info` dict passed to the hook and can add to it, e.g. the
+    "size" (width, height) of the image it produced.
+    """
+    callback = stage_callback.get()
+    if callback is None:
+        yield info
+        return
+
+    start = time.perf_counter()
+    try:
+        yield info
+    finally:
+        callback(name, time.perf_counter() - start, info)
+
+
+class Profile:
+    """
+    Stage hook that records every stage, see `profile`.
+    """
+
+    def __init__(self):
+        self.records: List[Tuple[str, float, Dict[str, Any]]] = []
+
+    def __call__(self, name: str, seconds: float, info: Dict[str, Any]) -> None:
+        self.records.append((name, seconds, info))
+
+    def totals(self) -> Dict[str, Tuple[float, int]]:
+        """
+        Total seconds and number of runs of each stage, in first-run order.
+        """
+        totals: Dict[str, List] = defaultdict(lambda: [0.0, 0])
+        for name, seconds, _ in self.records:
+            totals[name][0] += seconds
+            totals[name][1] += 1
+        return {name: (seconds, count) for name, (seconds, count) in totals.items()}
+
+    def summary(self) -> str:
+        sizes = {}
+        for name, _, info in self.records:
+            if "size" in info:
+                sizes[name] = info["size"]
+
+        lines = []
+        for name, (seconds, count) in self.totals().items():
+            line = f"{name:<12} {seconds * 1000:>10.1f} ms  x{count}"
+            if name in sizes:
+                line += f"  {sizes[name][0]}x{sizes[name][1]}"
+            lines.append(line)
+        return "\n".join(lines)
+
+
+@contextmanager
+def profile() -> Iterator[Profile]:
+    """
+    Record the stages of every `remove` call made inside the block.
+
+    Example:
+        with profile() as timings:
+            remove(data)
+        print(timings.summary())
+    """
+    timings = Profile()
+    with stage_hook(timings):
+        yield timings
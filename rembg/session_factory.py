@@ -1,7 +1,11 @@
+import json
 import os
-from typing import Type
+import threading
+from collections import OrderedDict
+from typing import Any, Dict, Iterable, Type
 
 import onnxruntime as ort
+from PIL import Image
 
 from .sessions import sessions_class
 from .sessions.base import BaseSession
@@ -15,6 +19,96 @@ from .sessions.u2net import U2netSession
 from .sessions.u2netp import U2netpSession
 
 
+GRAPH_OPTIMIZATION_LEVELS = {
+    "disable": ort.GraphOptimizationLevel.ORT_DISABLE_ALL,
+    "basic": ort.GraphOptimizationLevel.ORT_ENABLE_BASIC,
+    "extended": ort.GraphOptimizationLevel.ORT_ENABLE_EXTENDED,
+    "all": ort.GraphOptimizationLevel.ORT_ENABLE_ALL,
+}
+
+EXECUTION_MODES = {
+    "sequential": ort.ExecutionMode.ORT_SEQUENTIAL,
+    "parallel": ort.ExecutionMode.ORT_PARALLEL,
+}
+
+
+def load_session_config(*args, **kwargs) -> Dict[str, Any]:
+    """
+    Collect the ONNX Runtime session configuration.
+
+    Settings are read from the JSON file named by the 'session_config' keyword argument or the
+    'REMBG_SESSION_CONFIG' environment variable, then overridden by the 'session_options' keyword
+    argument (a dict). Supported keys are 'graph_optimization_level' (disable, basic, extended, all),
+    'execution_mode' (sequential, parallel), 'enable_cpu_mem_arena', 'enable_mem_pattern',
+    'intra_op_num_threads', 'inter_op_num_threads' and 'optimized_model_cache'.
+
+    Parameters:
+        *args: Additional positional arguments.
+        **kwargs: Additional keyword arguments.
+
+    Returns:
+        Dict[str, Any]: The merged configuration.
+    """
+    config: Dict[str, Any] = {}
+
+    config_path = kwargs.get("session_config") or os.getenv("REMBG_SESSION_CONFIG")
+    if config_path:
+        with open(os.path.expanduser(config_path)) as f:
+            config.update(json.load(f))
+
+    config.update(kwargs.get("session_options") or {})
+    return config
+
+
+def new_session_options(config: Dict[str, Any]) -> ort.SessionOptions:
+    """
+    Build the ONNX Runtime session options for a configuration from 'load_session_config'.
+
+    If the thread counts are not configured and the 'OMP_NUM_THREADS' environment variable is set,
+    both 'inter_op_num_threads' and 'intra_op_num_threads' are set to its value.
+
+    Parameters:
+        config (Dict[str, Any]): The session configuration.
+
+    Returns:
+        ort.SessionOptions: The session options.
+
+    Raises:
+        ValueError: If the graph optimization level or the execution mode is unknown.
+    """
+    sess_opts = ort.SessionOptions()
+
+    if "OMP_NUM_THREADS" in os.environ:
+        sess_opts.inter_op_num_threads = int(os.environ["OMP_NUM_THREADS"])
+        sess_opts.intra_op_num_threads = int(os.environ["OMP_NUM_THREADS"])
+
+    if "graph_optimization_level" in config:
+        level = config["graph_optimization_level"]
+        if level not in GRAPH_OPTIMIZATION_LEVELS:
+            raise ValueError(f"Unknown graph_optimization_level: {level}")
+        sess_opts.graph_optimization_level = GRAPH_OPTIMIZATION_LEVELS[level]
+
+    if "execution_mode" in config:
+        mode = config["execution_mode"]
+        if mode not in EXECUTION_MODES:
+            raise ValueError(f"Unknown execution_mode: {mode}")
+        sess_opts.execution_mode = EXECUTION_MODES[mode]
+
+    if "enable_cpu_mem_arena" in config:
+        sess_opts.enable_cpu_mem_arena = bool(config["enable_cpu_mem_arena"])
+
+    if "enable_mem_pattern" in config:
+        sess_opts.enable_mem_pattern = bool(config["enable_mem_pattern"])
+
+    if "intra_op_num_threads" in config:
+        sess_opts.intra_op_num_threads = int(config["intra_op_num_threads"])
+
+    if "inter_op_num_threads" in config:
+        sess_opts.inter_op_num_threads = int(config["inter_op_num_threads"])
+
+    return sess_opts
+
+
 def new_session(
     model_name: str = "u2net", providers=None, *args, **kwargs
 ) -> BaseSession:
@@ -23,8 +117,8 @@ def new_session(
 
     This function searches for the session class based on the model name in the 'sessions_class' list.
     It then creates an instance of the session class with the provided arguments.
-    The 'sess_opts' object is created using the 'ort.SessionOptions()' constructor.
-    If the 'OMP_NUM_THREADS' environment variable is set, the 'inter_op_num_threads' option of 'sess_opts' is set to its value.
+    The 'sess_opts' object is built by 'new_session_options' from the configuration returned by 'load_session_config'.
+    If 'optimized_model_cache' is enabled there, the session saves its optimized graph on first load and reuses it afterwards.
 
     Parameters:
         model_name (str): The name of the model.
@@ -59,10 +153,117 @@ def new_session(
             session_class = sc
             break
 
-    sess_opts = ort.SessionOptions()
-
-    if "OMP_NUM_THREADS" in os.environ:
-        sess_opts.inter_op_num_threads = int(os.environ["OMP_NUM_THREADS"])
-        sess_opts.intra_op_num_threads = int(os.environ["OMP_NUM_THREADS"])
+    config = load_session_config(*args, **kwargs)
+    sess_opts = new_session_options(config)
+    kwargs["optimized_model_cache"] = bool(config.get("optimized_model_cache", False))
 
     return session_class(model_name, sess_opts, providers, *args, **kwargs)
+
+
+# keyword arguments that change how a session is built; all others are per-request predict arguments
+SESSION_KWARGS = [
+    "session_config",
+    "session_options",
+    "quantized",
+    "resize_filter",
+    "model_path",
+    "sam_model",
+    "sam_quant",
+    "sam_embedding_cache_size",
+]
+
+
+class SessionManager:
+    """
+    Thread-safe cache of sessions for long-running processes such as the HTTP server.
+
+    A session is created lazily on the first request for a given model name and session-construction
+    keyword arguments (see `SESSION_KWARGS`; per-request arguments such as 'sam_prompt' are ignored),
+    and the same warmed-up instance is returned for every later request with the same key. Sessions
+    for different keys are created in parallel; concurrent requests for the same key wait for a
+    single construction. At most `max_sessions` sessions are kept, the least recently used is dropped.
+    """
+
+    def __init__(self, max_sessions: int = 8):
+        self.max_sessions = max_sessions
+        self.sessions: "OrderedDict[str, BaseSession]" = OrderedDict()
+        self.locks: Dict[str, threading.Lock] = {}
+        self.lock = threading.Lock()
+
+    @staticmethod
+    def session_kwargs(**kwargs) -> Dict[str, Any]:
+        return {name: kwargs[name] for name in SESSION_KWARGS if name in kwargs}
+
+    @staticmethod
+    def key(model_name: str, **kwargs) -> str:
+        return json.dumps(
+            [model_name, SessionManager.session_kwargs(**kwargs)],
+            sort_keys=True,
+            default=str,
+        )
+
+    def get(self, model_name: str = "u2net", *args, **kwargs) -> BaseSession:
+        """
+        Return the session for a model name and keyword arguments, creating and warming it up if needed.
+
+        Parameters:
+            model_name (str): The name of the model.
+            *args: Additional positional arguments for 'new_session'.
+            **kwargs: Additional keyword arguments, only those in `SESSION_KWARGS` are passed to 'new_session'.
+
+        Returns:
+            BaseSession: The cached session.
+        """
+        key = self.key(model_name, **kwargs)
+
+        with self.lock:
+            session = self.sessions.get(key)
+            if session is not None:
+                self.sessions.move_to_end(key)
+                return session
+
+            key_lock = self.locks.setdefault(key, threading.Lock())
+
+        with key_lock:
+            with self.lock:
+                session = self.sessions.get(key)
+            if session is not None:
+                return session
+
+            session = new_session(
+                model_name, *args, **self.session_kwargs(**kwargs)
+            )
+            self.warmup(session)
+
+            with self.lock:
+                self.sessions[key] = session
+                while len(self.sessions) > self.max_sessions:
+                    evicted, _ = self.sessions.popitem(last=False)
+                    self.locks.pop(evicted, None)
+
+        return session
+
+    def prewarm(self, model_names: Iterable[str], **kwargs) -> None:
+        """
+        Create and warm up the sessions for the given model names ahead of the first request.
+
+        Parameters:
+            model_names (Iterable[str]): The names of the models.
+            **kwargs: Additional keyword arguments for 'new_session'.
+
+        Returns:
+            None
+        """
+        for model_name in model_names:
+            self.get(model_name, **kwargs)
+
+    @staticmethod
+    def warmup(session: BaseSession) -> None:
+        # the first run allocates the ORT buffers, keep that out of the first request
+        try:
+            session.predict(Image.new("RGB", (64, 64)))
+        except Exception:
+            pass
+
+    def __len__(self) -> int:
+        return len(self.sessions)
@@ -1,6 +1,9 @@
+import functools
 import os
-from typing import Dict, List, Tuple
+import threading
+from typing import Dict, List, Optional, Tuple
 
+import cv2
 import numpy as np
 import onnxruntime as ort
 from PIL import Image
@@ -8,10 +11,46 @@ from PIL.Image import Image as PILImage
 
 from modules.paths import models_path
 
+from ..profiling import stage
+
+
+# resize filters, "lanczos" keeps the original PIL resampling and the others
+# use the faster OpenCV interpolation of the same name
+RESIZE_FILTERS = {
+    "lanczos": None,
+    "nearest": cv2.INTER_NEAREST,
+    "linear": cv2.INTER_LINEAR,
+    "cubic": cv2.INTER_CUBIC,
+    "area": cv2.INTER_AREA,
+    "auto": None,
+}
+
+
+@functools.lru_cache(maxsize=64)
+def normalize_lut(
+    max_value: int,
+    mean: Tuple[float, float, float],
+    std: Tuple[float, float, float],
+) -> np.ndarray:
+    """
+    Build a per-channel lookup table mapping every uint8 pixel value to its
+    normalized float32 value, computed in float64 exactly like the reference
+    `(value / max - mean) / std` so lookups give bit-identical results.
+    """
+    values = np.arange(256) / np.uint8(max_value)
+    lut = (values[None, :] - np.array(mean)[:, None]) / np.array(std)[:, None]
+    return lut.astype(np.float32)
+
 
 class BaseSession:
     """This is a base class for managing a session with a machine learning model."""
 
+    # Input normalization of the model. Single-output mask models that set these
+    # get `predict` and `predict_batch` from this class; the others override them.
+    norm_mean: Optional[Tuple[float, float, float]] = None
+    norm_std: Optional[Tuple[float, float, float]] = None
+    input_size: Optional[Tuple[int, int]] = None
+
     def __init__(
         self,
         model_name: str,
@@ -22,6 +61,12 @@ class BaseSession:
     ):
         """Initialize an instance of the BaseSession class."""
         self.model_name = model_name
+        self.buffers = threading.local()
+
+        self.resize_filter = kwargs.get("resize_filter", "lanczos")
+        if self.resize_filter not in RESIZE_FILTERS:
+            raise ValueError(f"Unknown resize_filter: {self.resize_filter}")
+        self.output_specs: Dict[Tuple, List[Tuple[Tuple[int, ...], np.dtype]]] = {}
 
         self.providers = []
 
@@ -33,12 +78,85 @@ class BaseSession:
         else:
             self.providers.extend(_providers)
 
-        self.inner_session = ort.InferenceSession(
-            str(self.__class__.download_models(*args, **kwargs)),
-            providers=self.providers,
-            sess_options=sess_opts,
+        model_path = str(self.__class__.download_models(*args, **kwargs))
+        if kwargs.get("quantized", False):
+            model_path = self.__class__.quantized_model_path(model_path)
+            if not os.path.exists(model_path):
+                raise ValueError(
+                    f"{model_path} not found, quantize {self.name()} with the 'q' command first"
+                )
+
+        self.inner_session = self.create_inference_session(
+            model_path,
+            sess_opts,
+            self.providers,
+            *args,
+            **kwargs,
         )
 
+    @classmethod
+    def create_inference_session(
+        cls,
+        model_path: str,
+        sess_opts: ort.SessionOptions,
+        providers: List[str],
+        *args,
+        **kwargs
+    ) -> ort.InferenceSession:
+        """
+        Create an ONNX Runtime session for a model file.
+
+        With the 'optimized_model_cache' keyword argument set, the graph optimized by ONNX Runtime is
+        saved under 'u2net_home()/optimized' on the first load, keyed by the optimization level and the
+        first provider. Later loads read that file with graph optimizations disabled, skipping the
+        optimization work. The cached file is rebuilt when the source model is newer.
+
+        Parameters:
+            model_path (str): The path to the ONNX model.
+            sess_opts (ort.SessionOptions): The session options.
+            providers (List[str]): The execution providers.
+            *args: Additional positional arguments.
+            **kwargs: Additional keyword arguments.
+
+        Returns:
+            ort.InferenceSession: The inference session.
+        """
+        if not kwargs.get("optimized_model_cache", False):
+            return ort.InferenceSession(
+                model_path, providers=providers, sess_options=sess_opts
+            )
+
+        level = sess_opts.graph_optimization_level
+        stem = os.path.splitext(os.path.basename(model_path))[0]
+        provider = providers[0] if providers else "default"
+        optimized_dir = os.path.join(cls.u2net_home(*args, **kwargs), "optimized")
+        optimized_path = os.path.join(
+            optimized_dir, f"{stem}.{level.name}.{provider}.onnx"
+        )
+
+        if os.path.exists(optimized_path) and os.path.getmtime(
+            optimized_path
+        ) >= os.path.getmtime(model_path):
+            # the saved graph is already optimized, don't optimize it again
+            sess_opts.graph_optimization_level = (
+                ort.GraphOptimizationLevel.ORT_DISABLE_ALL
+            )
+            try:
+                return ort.InferenceSession(
+                    optimized_path, providers=providers, sess_options=sess_opts
+                )
+            finally:
+                sess_opts.graph_optimization_level = level
+
+        os.makedirs(optimized_dir, exist_ok=True)
+        sess_opts.optimized_model_filepath = optimized_path
+        try:
+            return ort.InferenceSession(
+                model_path, providers=providers, sess_options=sess_opts
+            )
+        finally:
+            sess_opts.optimized_model_filepath = ""
+
     def normalize(
         self,
         img: PILImage,
@@ -48,26 +166,236 @@ class BaseSession:
         *args,
         **kwargs
     ) -> Dict[str, np.ndarray]:
-        im = img.convert("RGB").resize(size, Image.LANCZOS)
+        return self.normalize_batch([img], mean, std, size, *args, **kwargs)
+
+    def normalize_batch(
+        self,
+        imgs: List[PILImage],
+        mean: Tuple[float, float, float],
+        std: Tuple[float, float, float],
+        size: Tuple[int, int],
+        *args,
+        **kwargs
+    ) -> Dict[str, np.ndarray]:
+        """
+        Normalize several images into a single (N, 3, H, W) model input.
+
+        Parameters:
+            imgs (List[PILImage]): The input images.
+            mean (Tuple[float, float, float]): The per-channel mean.
+            std (Tuple[float, float, float]): The per-channel standard deviation.
+            size (Tuple[int, int]): The model input size as (width, height).
+
+        Returns:
+            Dict[str, np.ndarray]: The model input keyed by the input name.
+        """
+        with stage("normalize", size=tuple(size), batch=len(imgs)):
+            input_buffer = self.get_buffer(
+                "input", (len(imgs), 3, size[1], size[0]), np.float32
+            )
+
+            for i, img in enumerate(imgs):
+                im_ary = self.resize(img.convert("RGB"), size)
+
+                lut = normalize_lut(int(np.max(im_ary)), tuple(mean), tuple(std))
+                for c in range(3):
+                    np.take(
+                        lut[c], im_ary[:, :, c], out=input_buffer[i, c], mode="clip"
+                    )
+
+        return {self.inner_session.get_inputs()[0].name: input_buffer}
+
+    def supports_batch(self) -> bool:
+        """
+        Check whether the model accepts a dynamic batch dimension.
+
+        Returns:
+            bool: True if several images can be stacked into one run.
+        """
+        return not isinstance(self.inner_session.get_inputs()[0].shape[0], int)
+
+    def pred_to_mask(self, pred: np.ndarray, size: Tuple[int, int]) -> PILImage:
+        """
+        Min-max normalize a raw single-image prediction into an 8-bit mask of the given size.
+
+        Parameters:
+            pred (np.ndarray): The prediction for one image.
+            size (Tuple[int, int]): The output size as (width, height).
+
+        Returns:
+            PILImage: The mask image.
+        """
+        with stage("mask", size=pred.shape[-2:][::-1]):
+            ma = np.max(pred)
+            mi = np.min(pred)
+
+            pred = (pred - mi) / (ma - mi)
+            pred = np.squeeze(pred)
+
+            mask = Image.fromarray((pred * 255).astype("uint8"), mode="L")
+
+        return self.resize_mask(mask, size)
 
-        im_ary = np.array(im)
-        im_ary = im_ary / np.max(im_ary)
+    def resize_mask(self, mask: PILImage, size: Tuple[int, int]) -> PILImage:
+        """
+        Resize a mode "L" mask with the session's 'resize_filter', see `resize`.
 
-        tmpImg = np.zeros((im_ary.shape[0], im_ary.shape[1], 3))
-        tmpImg[:, :, 0] = (im_ary[:, :, 0] - mean[0]) / std[0]
-        tmpImg[:, :, 1] = (im_ary[:, :, 1] - mean[1]) / std[1]
-        tmpImg[:, :, 2] = (im_ary[:, :, 2] - mean[2]) / std[2]
+        Parameters:
+            mask (PILImage): The mask to resize.
+            size (Tuple[int, int]): The output size as (width, height).
 
-        tmpImg = tmpImg.transpose((2, 0, 1))
+        Returns:
+            PILImage: The resized mask.
+        """
+        with stage("mask_resize", size=tuple(size)):
+            if self.resize_filter == "lanczos":
+                return mask.resize(size, Image.LANCZOS)
 
-        return {
-            self.inner_session.get_inputs()[0]
-            .name: np.expand_dims(tmpImg, 0)
-            .astype(np.float32)
-        }
+            return Image.fromarray(self.resize(mask, size), mode="L")
+
+    def resize(self, img: PILImage, size: Tuple[int, int]) -> np.ndarray:
+        """
+        Resize an image with the session's 'resize_filter'.
+
+        The default "lanczos" filter uses PIL LANCZOS resampling. "nearest", "linear", "cubic" and "area"
+        use the OpenCV interpolation of the same name, and "auto" picks OpenCV INTER_AREA when shrinking
+        and INTER_LINEAR when enlarging, which is much faster on large photos.
+
+        Parameters:
+            img (PILImage): The image to resize.
+            size (Tuple[int, int]): The output size as (width, height).
+
+        Returns:
+            np.ndarray: The resized image.
+        """
+        if self.resize_filter == "lanczos":
+            return np.asarray(img.resize(size, Image.LANCZOS))
+
+        interpolation = RESIZE_FILTERS[self.resize_filter]
+        if interpolation is None:
+            shrinking = size[0] * size[1] < img.width * img.height
+            interpolation = cv2.INTER_AREA if shrinking else cv2.INTER_LINEAR
+
+        return cv2.resize(np.asarray(img), size, interpolation=interpolation)
+
+    def get_buffer(self, name: str, shape: Tuple[int, ...], dtype) -> np.ndarray:
+        """
+        Return a reusable array for `name` with the given shape and dtype.
+
+        Buffers are kept per thread, so a session shared by server worker
+        threads never hands the same memory to two concurrent calls. The
+        contents are overwritten by the next call on the same thread.
+        """
+        buffers = self.buffers.__dict__.setdefault("arrays", {})
+        key = (name, tuple(shape), np.dtype(dtype))
+        buffer = buffers.get(key)
+        if buffer is None:
+            buffer = buffers[key] = np.empty(shape, dtype=dtype)
+        return buffer
+
+    def run(self, input_feed: Dict[str, np.ndarray]) -> List[np.ndarray]:
+        """
+        Run the inner session and return all of its outputs.
+
+        The first call for a given set of input shapes runs normally to learn
+        the output shapes. Later calls use ORT IO binding: inputs are bound in
+        place and outputs are written into reusable buffers from `get_buffer`,
+        so the hot path allocates no new arrays. The returned arrays are
+        overwritten by the next call on the same thread.
+
+        Parameters:
+            input_feed (Dict[str, np.ndarray]): The input arrays by input name.
+
+        Returns:
+            List[np.ndarray]: The output arrays, in model output order.
+        """
+        with stage("inference") as info:
+            shape = next(iter(input_feed.values())).shape
+            if len(shape) == 4:
+                info.update(size=(shape[3], shape[2]), batch=shape[0])
+
+            key = tuple((name, value.shape) for name, value in input_feed.items())
+            output_specs = self.output_specs.get(key)
+
+            if output_specs is None:
+                ort_outs = self.inner_session.run(None, input_feed)
+                self.output_specs[key] = [(out.shape, out.dtype) for out in ort_outs]
+                return ort_outs
+
+            binding = self.inner_session.io_binding()
+            for name, value in input_feed.items():
+                binding.bind_cpu_input(name, np.ascontiguousarray(value))
+
+            ort_outs = []
+            outputs = self.inner_session.get_outputs()
+            for output, (shape, dtype) in zip(outputs, output_specs):
+                buffer = self.get_buffer(f"output:{output.name}", shape, dtype)
+                binding.bind_output(
+                    output.name, "cpu", 0, dtype.type, shape, buffer.ctypes.data
+                )
+                ort_outs.append(buffer)
+
+            self.inner_session.run_with_iobinding(binding)
+            return ort_outs
 
     def predict(self, img: PILImage, *args, **kwargs) -> List[PILImage]:
-        raise NotImplementedError
+        """
+        Predict the mask of an image.
+
+        The default runs the model on the image normalized with the class'
+        `norm_mean`, `norm_std` and `input_size`, and turns the first channel of
+        the first output into the mask.
+
+        Parameters:
+            img (PILImage): The input image.
+            *args: Additional positional arguments.
+            **kwargs: Additional keyword arguments.
+
+        Returns:
+            List[PILImage]: The list of output masks.
+        """
+        if self.input_size is None:
+            raise NotImplementedError
+
+        ort_outs = self.run(
+            self.normalize(img, self.norm_mean, self.norm_std, self.input_size),
+        )
+
+        return [self.pred_to_mask(ort_outs[0][:, 0, :, :], img.size)]
+
+    def predict_batch(
+        self, imgs: List[PILImage], *args, **kwargs
+    ) -> List[List[PILImage]]:
+        """
+        Predict the masks of several images.
+
+        Sessions using the default `predict` run all images at once when the
+        model has a dynamic batch dimension. Otherwise `predict` is called per
+        image.
+
+        Parameters:
+            imgs (List[PILImage]): The input images.
+            *args: Additional positional arguments.
+            **kwargs: Additional keyword arguments.
+
+        Returns:
+            List[List[PILImage]]: The list of masks for each input image.
+        """
+        if (
+            type(self).predict is not BaseSession.predict
+            or self.input_size is None
+            or not self.supports_batch()
+        ):
+            return [self.predict(img, *args, **kwargs) for img in imgs]
+
+        ort_outs = self.run(
+            self.normalize_batch(imgs, self.norm_mean, self.norm_std, self.input_size),
+        )
+
+        return [
+            [self.pred_to_mask(ort_outs[0][i : i + 1, 0, :, :], img.size)]
+            for i, img in enumerate(imgs)
+        ]
 
     @classmethod
     def checksum_disabled(cls, *args, **kwargs):
@@ -88,6 +416,35 @@ class BaseSession:
     def download_models(cls, *args, **kwargs):
         raise NotImplementedError
 
+    @classmethod
+    def quantized_model_path(cls, model_path: str) -> str:
+        root, ext = os.path.splitext(model_path)
+        return f"{root}.quant{ext}"
+
+    @classmethod
+    def quantize_models(cls, *args, **kwargs):
+        """
+        Write an int8 dynamic-quantized copy of the model next to the downloaded one.
+
+        Sessions created with the 'quantized' keyword argument load this copy instead.
+
+        Parameters:
+            *args: Additional positional arguments.
+            **kwargs: Additional keyword arguments. 'force' rebuilds an existing copy.
+
+        Returns:
+            str: The path to the quantized model file.
+        """
+        from onnxruntime.quantization import QuantType, quantize_dynamic
+
+        model_path = str(cls.download_models(*args, **kwargs))
+        quant_path = cls.quantized_model_path(model_path)
+
+        if kwargs.get("force", False) or not os.path.exists(quant_path):
+            quantize_dynamic(model_path, quant_path, weight_type=QuantType.QUInt8)
+
+        return quant_path
+
     @classmethod
     def name(cls, *args, **kwargs):
         raise NotImplementedError
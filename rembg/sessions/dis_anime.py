@@ -1,10 +1,6 @@
 import os
-from typing import List
 
-import numpy as np
 import pooch
-from PIL import Image
-from PIL.Image import Image as PILImage
 
 from .base import BaseSession
 
@@ -14,35 +10,9 @@ class DisSession(BaseSession):
     This class represents a session for object detection.
     """
 
-    def predict(self, img: PILImage, *args, **kwargs) -> List[PILImage]:
-        """
-        Use a pre-trained model to predict the object in the given image.
-
-        Parameters:
-            img (PILImage): The input image.
-            *args: Variable length argument list.
-            **kwargs: Arbitrary keyword arguments.
-
-        Returns:
-            List[PILImage]: A list of predicted mask images.
-        """
-        ort_outs = self.inner_session.run(
-            None,
-            self.normalize(img, (0.485, 0.456, 0.406), (1.0, 1.0, 1.0), (1024, 1024)),
-        )
-
-        pred = ort_outs[0][:, 0, :, :]
-
-        ma = np.max(pred)
-        mi = np.min(pred)
-
-        pred = (pred - mi) / (ma - mi)
-        pred = np.squeeze(pred)
-
-        mask = Image.fromarray((pred * 255).astype("uint8"), mode="L")
-        mask = mask.resize(img.size, Image.LANCZOS)
-
-        return [mask]
+    norm_mean = (0.485, 0.456, 0.406)
+    norm_std = (1.0, 1.0, 1.0)
+    input_size = (1024, 1024)
 
     @classmethod
     def download_models(cls, *args, **kwargs):
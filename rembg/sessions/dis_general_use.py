@@ -1,44 +1,14 @@
 import os
-from typing import List
 
-import numpy as np
 import pooch
-from PIL import Image
-from PIL.Image import Image as PILImage
 
 from .base import BaseSession
 
 
 class DisSessionGeneralUse(BaseSession):
-    def predict(self, img: PILImage, *args, **kwargs) -> List[PILImage]:
-        """
-        Predicts the mask image for the input image.
-
-        This method takes a PILImage object as input and returns a list of PILImage objects as output. It performs several image processing operations to generate the mask image.
-
-        Parameters:
-            img (PILImage): The input image.
-
-        Returns:
-            List[PILImage]: A list of PILImage objects representing the generated mask image.
-        """
-        ort_outs = self.inner_session.run(
-            None,
-            self.normalize(img, (0.485, 0.456, 0.406), (1.0, 1.0, 1.0), (1024, 1024)),
-        )
-
-        pred = ort_outs[0][:, 0, :, :]
-
-        ma = np.max(pred)
-        mi = np.min(pred)
-
-        pred = (pred - mi) / (ma - mi)
-        pred = np.squeeze(pred)
-
-        mask = Image.fromarray((pred * 255).astype("uint8"), mode="L")
-        mask = mask.resize(img.size, Image.LANCZOS)
-
-        return [mask]
+    norm_mean = (0.485, 0.456, 0.406)
+    norm_std = (1.0, 1.0, 1.0)
+    input_size = (1024, 1024)
 
     @classmethod
     def download_models(cls, *args, **kwargs):
@@ -1,6 +1,10 @@
+import hashlib
+import json
 import os
+import threading
+from collections import OrderedDict
 from copy import deepcopy
-from typing import List
+from typing import Any, Dict, List
 
 import cv2
 import numpy as np
@@ -10,6 +14,7 @@ from jsonschema import validate
 from PIL import Image
 from PIL.Image import Image as PILImage
 
+from ..profiling import stage
 from .base import BaseSession
 
 
@@ -95,17 +100,25 @@ class SamSession(BaseSession):
         """
         self.model_name = model_name
         paths = self.__class__.download_models(*args, **kwargs)
-        self.encoder = ort.InferenceSession(
+        self.encoder = self.create_inference_session(
             str(paths[0]),
-            providers=ort.get_available_providers(),
-            sess_options=sess_opts,
+            sess_opts,
+            ort.get_available_providers(),
+            *args,
+            **kwargs,
         )
-        self.decoder = ort.InferenceSession(
+        self.decoder = self.create_inference_session(
             str(paths[1]),
-            providers=ort.get_available_providers(),
-            sess_options=sess_opts,
+            sess_opts,
+            ort.get_available_providers(),
+            *args,
+            **kwargs,
         )
 
+        self.embeddings: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+        self.embeddings_size = int(kwargs.get("sam_embedding_cache_size", 8))
+        self.embeddings_lock = threading.Lock()
+
     def normalize(
         self,
         img: np.ndarray,
@@ -140,17 +153,26 @@ class SamSession(BaseSession):
         """
         Predict masks for an input image.
 
-        This function takes an image as input and performs various preprocessing steps on the image. It then runs the image through an encoder to obtain an image embedding. The function also takes input labels and points as additional arguments. It concatenates the input points and labels with padding and transforms them. It creates an empty mask input and an indicator for no mask. The function then passes the image embedding, point coordinates, point labels, mask input, and has mask input to a decoder. The decoder generates masks based on the input and returns them as a list of images.
+        This function takes an image as input and performs various preprocessing steps on the image. It then runs the image through an encoder to obtain an image embedding, which is cached per image (see `encode`). The function also takes input labels and points as additional arguments. It concatenates the input points and labels with padding and transforms them. It creates an empty mask input and an indicator for no mask. The function then passes the image embedding, point coordinates, point labels, mask input, and has mask input to a decoder. The decoder generates masks based on the input and returns them as a list of images.
 
         Parameters:
             img (PILImage): The input image.
             *args: Additional arguments.
-            **kwargs: Additional keyword arguments.
+            **kwargs: Additional keyword arguments. 'sam_prompt' is a list of point and rectangle marks, or its
+                JSON string; without it, the object at the center of the image is segmented.
 
         Returns:
             List[PILImage]: A list of masks generated by the decoder.
         """
-        prompt = kwargs.get("sam_prompt", "{}")
+        prompt = kwargs.get("sam_prompt")
+        if isinstance(prompt, str):
+            prompt = json.loads(prompt)
+        if not prompt:
+            # without a prompt, segment the object at the center of the image
+            prompt = [
+                {"type": "point", "data": [img.width / 2, img.height / 2], "label": 1}
+            ]
+
         schema = {
             "type": "array",
             "items": {
@@ -170,45 +192,11 @@ class SamSession(BaseSession):
 
         target_size = 1024
         input_size = (684, 1024)
-        encoder_input_name = self.encoder.get_inputs()[0].name
-
-        img = img.convert("RGB")
-        cv_image = np.array(img)
-        original_size = cv_image.shape[:2]
-
-        scale_x = input_size[1] / cv_image.shape[1]
-        scale_y = input_size[0] / cv_image.shape[0]
-        scale = min(scale_x, scale_y)
-
-        transform_matrix = np.array(
-            [
-                [scale, 0, 0],
-                [0, scale, 0],
-                [0, 0, 1],
-            ]
-        )
-
-        cv_image = cv2.warpAffine(
-            cv_image,
-            transform_matrix[:2],
-            (input_size[1], input_size[0]),
-            flags=cv2.INTER_LINEAR,
-        )
 
-        ## encoder
-
-        encoder_inputs = {
-            encoder_input_name: cv_image.astype(np.float32),
-        }
-
-        encoder_output = self.encoder.run(None, encoder_inputs)
-        image_embedding = encoder_output[0]
-
-        embedding = {
-            "image_embedding": image_embedding,
-            "original_size": original_size,
-            "transform_matrix": transform_matrix,
-        }
+        embedding = self.encode(img, input_size)
+        image_embedding = embedding["image_embedding"]
+        original_size = embedding["original_size"]
+        transform_matrix = embedding["transform_matrix"]
 
         ## decoder
 
@@ -245,7 +233,8 @@ class SamSession(BaseSession):
             "orig_im_size": np.array(input_size, dtype=np.float32),
         }
 
-        masks, _, _ = self.decoder.run(None, decoder_inputs)
+        with stage("inference"):
+            masks, _, _ = self.decoder.run(None, decoder_inputs)
         inv_transform_matrix = np.linalg.inv(transform_matrix)
         masks = transform_masks(masks, original_size, inv_transform_matrix)
 
@@ -256,6 +245,72 @@ class SamSession(BaseSession):
         mask = Image.fromarray(mask).convert("L")
         return [mask]
 
+    def encode(self, img: PILImage, input_size) -> Dict[str, Any]:
+        """
+        Run the image encoder, or return the cached embedding of the same image.
+
+        Embeddings are cached by a hash of the image pixels, so predicting the same image with another
+        prompt only runs the decoder. The 'sam_embedding_cache_size' most recent images are kept.
+
+        Args:
+            img (PILImage): The input image.
+            input_size (tuple): The encoder input size as (height, width).
+
+        Returns:
+            Dict[str, Any]: The image embedding, the original size and the transform matrix.
+        """
+        cv_image = np.array(img.convert("RGB"))
+        key = hashlib.sha1(cv_image.tobytes())
+        key.update(str(cv_image.shape).encode())
+        key = key.hexdigest()
+
+        with self.embeddings_lock:
+            embedding = self.embeddings.get(key)
+            if embedding is not None:
+                self.embeddings.move_to_end(key)
+                return embedding
+
+        original_size = cv_image.shape[:2]
+
+        scale_x = input_size[1] / cv_image.shape[1]
+        scale_y = input_size[0] / cv_image.shape[0]
+        scale = min(scale_x, scale_y)
+
+        transform_matrix = np.array(
+            [
+                [scale, 0, 0],
+                [0, scale, 0],
+                [0, 0, 1],
+            ]
+        )
+
+        cv_image = cv2.warpAffine(
+            cv_image,
+            transform_matrix[:2],
+            (input_size[1], input_size[0]),
+            flags=cv2.INTER_LINEAR,
+        )
+
+        encoder_inputs = {
+            self.encoder.get_inputs()[0].name: cv_image.astype(np.float32),
+        }
+
+        with stage("inference"):
+            encoder_output = self.encoder.run(None, encoder_inputs)
+
+        embedding = {
+            "image_embedding": encoder_output[0],
+            "original_size": original_size,
+            "transform_matrix": transform_matrix,
+        }
+
+        with self.embeddings_lock:
+            self.embeddings[key] = embedding
+            while len(self.embeddings) > self.embeddings_size:
+                self.embeddings.popitem(last=False)
+
+        return embedding
+
     @classmethod
     def download_models(cls, *args, **kwargs):
         """
@@ -1,10 +1,6 @@
 import os
-from typing import List
 
-import numpy as np
 import pooch
-from PIL import Image
-from PIL.Image import Image as PILImage
 
 from .base import BaseSession
 
@@ -12,39 +8,9 @@ from .base import BaseSession
 class SiluetaSession(BaseSession):
     """This is a class representing a SiluetaSession object."""
 
-    def predict(self, img: PILImage, *args, **kwargs) -> List[PILImage]:
-        """
-        Predict the mask of the input image.
-
-        This method takes an image as input, preprocesses it, and performs a prediction to generate a mask. The generated mask is then post-processed and returned as a list of PILImage objects.
-
-        Parameters:
-            img (PILImage): The input image to be processed.
-            *args: Variable length argument list.
-            **kwargs: Arbitrary keyword arguments.
-
-        Returns:
-            List[PILImage]: A list of post-processed masks.
-        """
-        ort_outs = self.inner_session.run(
-            None,
-            self.normalize(
-                img, (0.485, 0.456, 0.406), (0.229, 0.224, 0.225), (320, 320)
-            ),
-        )
-
-        pred = ort_outs[0][:, 0, :, :]
-
-        ma = np.max(pred)
-        mi = np.min(pred)
-
-        pred = (pred - mi) / (ma - mi)
-        pred = np.squeeze(pred)
-
-        mask = Image.fromarray((pred * 255).astype("uint8"), mode="L")
-        mask = mask.resize(img.size, Image.LANCZOS)
-
-        return [mask]
+    norm_mean = (0.485, 0.456, 0.406)
+    norm_std = (0.229, 0.224, 0.225)
+    input_size = (320, 320)
 
     @classmethod
     def download_models(cls, *args, **kwargs):
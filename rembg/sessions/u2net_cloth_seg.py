@@ -1,12 +1,14 @@
 import os
 from typing import List
 
+import cv2
 import numpy as np
 import pooch
 from PIL import Image
 from PIL.Image import Image as PILImage
 from scipy.special import log_softmax
 
+from ..profiling import stage
 from .base import BaseSession
 
 palette1 = [
@@ -56,6 +58,10 @@ palette3 = [
 
 
 class Unet2ClothSession(BaseSession):
+    norm_mean = (0.485, 0.456, 0.406)
+    norm_std = (0.229, 0.224, 0.225)
+    input_size = (768, 768)
+
     def predict(self, img: PILImage, *args, **kwargs) -> List[PILImage]:
         """
         Predict the cloth category of an image.
@@ -73,11 +79,8 @@ class Unet2ClothSession(BaseSession):
         Returns:
             List[PILImage]: A list of images representing the predicted masks.
         """
-        ort_outs = self.inner_session.run(
-            None,
-            self.normalize(
-                img, (0.485, 0.456, 0.406), (0.229, 0.224, 0.225), (768, 768)
-            ),
+        ort_outs = self.run(
+            self.normalize(img, self.norm_mean, self.norm_std, self.input_size),
         )
 
         pred = ort_outs
@@ -86,8 +89,12 @@ class Unet2ClothSession(BaseSession):
         pred = np.squeeze(pred, 0)
         pred = np.squeeze(pred, 0)
 
-        mask = Image.fromarray(pred.astype("uint8"), mode="L")
-        mask = mask.resize(img.size, Image.LANCZOS)
+        # the mask holds class labels, so never interpolate between them
+        with stage("mask_resize", size=img.size):
+            mask = cv2.resize(
+                pred.astype("uint8"), img.size, interpolation=cv2.INTER_NEAREST
+            )
+            mask = Image.fromarray(mask, mode="L")
 
         masks = []
 
@@ -1,11 +1,7 @@
 import os
-from typing import List
 
-import numpy as np
 import onnxruntime as ort
 import pooch
-from PIL import Image
-from PIL.Image import Image as PILImage
 
 from .base import BaseSession
 
@@ -13,6 +9,10 @@ from .base import BaseSession
 class U2netCustomSession(BaseSession):
     """This is a class representing a custom session for the U2net model."""
 
+    norm_mean = (0.485, 0.456, 0.406)
+    norm_std = (0.229, 0.224, 0.225)
+    input_size = (320, 320)
+
     def __init__(
         self,
         model_name: str,
@@ -40,38 +40,6 @@ class U2netCustomSession(BaseSession):
 
         super().__init__(model_name, sess_opts, providers, *args, **kwargs)
 
-    def predict(self, img: PILImage, *args, **kwargs) -> List[PILImage]:
-        """
-        Predict the segmentation mask for the input image.
-
-        Parameters:
-            img (PILImage): The input image.
-            *args: Additional positional arguments.
-            **kwargs: Additional keyword arguments.
-
-        Returns:
-            List[PILImage]: A list of PILImage objects representing the segmentation mask.
-        """
-        ort_outs = self.inner_session.run(
-            None,
-            self.normalize(
-                img, (0.485, 0.456, 0.406), (0.229, 0.224, 0.225), (320, 320)
-            ),
-        )
-
-        pred = ort_outs[0][:, 0, :, :]
-
-        ma = np.max(pred)
-        mi = np.min(pred)
-
-        pred = (pred - mi) / (ma - mi)
-        pred = np.squeeze(pred)
-
-        mask = Image.fromarray((pred * 255).astype("uint8"), mode="L")
-        mask = mask.resize(img.size, Image.LANCZOS)
-
-        return [mask]
-
     @classmethod
     def download_models(cls, *args, **kwargs):
         """
@@ -0,0 +1,195 @@
+import argparse
+import logging
+import os
+import time
+
+import numpy as np
+import torch
+from PIL import Image
+
+from .system import TSR
+from .utils import (
+    TURNTABLE_PRESETS,
+    remove_background,
+    resize_foreground,
+    save_video,
+)
+
+
+class Timer:
+    def __init__(self):
+        self.items = {}
+        self.time_scale = 1000.0  # ms
+        self.time_unit = "ms"
+
+    def start(self, name: str) -> None:
+        if torch.cuda.is_available():
+            torch.cuda.synchronize()
+        self.items[name] = time.time()
+        logging.info(f"{name} ...")
+
+    def end(self, name: str) -> None:
+        if name not in self.items:
+            return
+        if torch.cuda.is_available():
+            torch.cuda.synchronize()
+        start_time = self.items.pop(name)
+        delta = time.time() - start_time
+        t = delta * self.time_scale
+        logging.info(f"{name} finished in {t:.2f}{self.time_unit}.")
+
+
+timer = Timer()
+
+
+def fill_background(image: Image.Image) -> Image.Image:
+    image = np.array(image).astype(np.float32) / 255.0
+    image = image[:, :, :3] * image[:, :, 3:4] + (1 - image[:, :, 3:4]) * 0.5
+    return Image.fromarray((image * 255.0).astype(np.uint8))
+
+
+def turntable(args: argparse.Namespace) -> None:
+    preset = dict(TURNTABLE_PRESETS[args.preset])
+    if args.render_resolution is not None:
+        preset["height"] = preset["width"] = args.render_resolution
+    if args.num_samples_per_ray is not None:
+        preset["num_samples_per_ray"] = args.num_samples_per_ray
+
+    device = args.device
+    if not torch.cuda.is_available():
+        device = "cpu"
+
+    timer.start("Initializing model")
+    model = TSR.from_pretrained(
+        args.pretrained_model_name_or_path,
+        config_name="config.yaml",
+        weight_name="model.ckpt",
+    )
+    model.renderer.set_chunk_size(args.chunk_size)
+    model.to(device)
+    timer.end("Initializing model")
+
+    rembg_session = None
+    if not args.no_remove_bg:
+        # the vendored rembg needs the web UI's `modules` package on the path
+        import rembg
+
+        rembg_session = rembg.new_session(model_name=args.rembg_model)
+    os.makedirs(args.output_dir, exist_ok=True)
+
+    for i, image_path in enumerate(args.image):
+        timer.start("Processing image")
+        image = Image.open(image_path)
+        if rembg_session is None:
+            image = image.convert("RGB")
+        else:
+            image = remove_background(image.convert("RGB"), rembg_session)
+            image = resize_foreground(image, args.foreground_ratio)
+            image = fill_background(image)
+        timer.end("Processing image")
+
+        timer.start("Running model")
+        with torch.no_grad():
+            scene_codes = model([image], device=device)
+        timer.end("Running model")
+
+        timer.start("Rendering turntable")
+        output_path = os.path.join(args.output_dir, f"{i}.mp4")
+        save_video(
+            model.render_iter(
+                scene_codes[0], args.n_views, return_type="uint8", **preset
+            ),
+            output_path,
+            fps=args.fps,
+        )
+        timer.end("Rendering turntable")
+        logging.info(f"Saved {image_path} -> {output_path}")
+
+
+def main() -> None:
+    logging.basicConfig(
+        format="%(asctime)s - %(levelname)s - %(message)s", level=logging.INFO
+    )
+
+    parser = argparse.ArgumentParser(prog="python -m tsr.cli")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    turntable_parser = subparsers.add_parser(
+        "turntable", help="Render a turntable preview video for each input image."
+    )
+    turntable_parser.add_argument(
+        "image", type=str, nargs="+", help="Path to input image(s)."
+    )
+    turntable_parser.add_argument(
+        "--device",
+        default="cuda:0",
+        type=str,
+        help="Device to use. If no CUDA-compatible device is found, will fallback to 'cpu'. Default: 'cuda:0'",
+    )
+    turntable_parser.add_argument(
+        "--pretrained-model-name-or-path",
+        default="stabilityai/TripoSR",
+        type=str,
+        help="Path to the pretrained model. Could be either a huggingface model id is or a local path. Default: 'stabilityai/TripoSR'",
+    )
+    turntable_parser.add_argument(
+        "--chunk-size",
+        default=8192,
+        type=int,
+        help="Evaluation chunk size for surface extraction and rendering. Smaller chunk size reduces VRAM usage but increases computation time. 0 for no chunking. Default: 8192",
+    )
+    turntable_parser.add_argument(
+        "--preset",
+        default="preview",
+        choices=list(TURNTABLE_PRESETS.keys()),
+        help="Resolution and sample count preset. Default: 'preview'",
+    )
+    turntable_parser.add_argument(
+        "--render-resolution",
+        default=None,
+        type=int,
+        help="Override the preset frame resolution.",
+    )
+    turntable_parser.add_argument(
+        "--num-samples-per-ray",
+        default=None,
+        type=int,
+        help="Override the preset number of samples per ray.",
+    )
+    turntable_parser.add_argument(
+        "--n-views", default=30, type=int, help="Number of frames. Default: 30"
+    )
+    turntable_parser.add_argument(
+        "--fps", default=30, type=int, help="Video frame rate. Default: 30"
+    )
+    turntable_parser.add_argument(
+        "--no-remove-bg",
+        action="store_true",
+        help="If specified, the background will NOT be automatically removed from the input image, and the input image should be an RGB image with gray background and properly-sized foreground. Default: false",
+    )
+    turntable_parser.add_argument(
+        "--rembg-model",
+        default="dis_general_use",
+        type=str,
+        help="Background removal model. Default: 'dis_general_use'",
+    )
+    turntable_parser.add_argument(
+        "--foreground-ratio",
+        default=0.85,
+        type=float,
+        help="Ratio of the foreground size to the image size. Only used when --no-remove-bg is not specified. Default: 0.85",
+    )
+    turntable_parser.add_argument(
+        "--output-dir",
+        default="output/",
+        type=str,
+        help="Output directory to save the results. Default: 'output/'",
+    )
+    turntable_parser.set_defaults(func=turntable)
+
+    args = parser.parse_args()
+    args.func(args)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,5 +1,5 @@
 from dataclasses import dataclass
-from typing import Dict
+from typing import Dict, Optional, Tuple
 
 import torch
 import torch.nn.functional as F
@@ -89,25 +89,21 @@ class TriplaneNeRFRenderer(BaseModule):
 
         return net_out
 
-    def _forward(
+    def _composite(
         self,
         decoder: torch.nn.Module,
         triplane: torch.Tensor,
         rays_o: torch.Tensor,
         rays_d: torch.Tensor,
-        **kwargs,
-    ):
-        rays_shape = rays_o.shape[:-1]
-        rays_o = rays_o.view(-1, 3)
-        rays_d = rays_d.view(-1, 3)
-        n_rays = rays_o.shape[0]
-
-        t_near, t_far, rays_valid = rays_intersect_bbox(rays_o, rays_d, self.cfg.radius)
-        t_near, t_far = t_near[rays_valid], t_far[rays_valid]
-
-        t_vals = torch.linspace(
-            0, 1, self.cfg.num_samples_per_ray + 1, device=triplane.device
-        )
+        t_near: torch.Tensor,
+        t_far: torch.Tensor,
+        num_samples_per_ray: Optional[int] = None,
+    ) -> Tuple[torch.Tensor, torch.Tensor]:
+        # rays are expected to intersect the bbox, (N_rays, 3) and (N_rays, 1)
+        if num_samples_per_ray is None:
+            num_samples_per_ray = self.cfg.num_samples_per_ray
+
+        t_vals = torch.linspace(0, 1, num_samples_per_ray + 1, device=triplane.device)
         t_mid = (t_vals[:-1] + t_vals[1:]) / 2.0
         z_vals = t_near * (1 - t_mid[None]) + t_far * t_mid[None]  # (N_rays, N_samples)
 
@@ -138,6 +134,43 @@ class TriplaneNeRFRenderer(BaseModule):
         comp_rgb_ = (weights[..., None] * mlp_out["color"]).sum(dim=-2)  # (N_rays, 3)
         opacity_ = weights.sum(dim=-1)  # (N_rays)
 
+        return comp_rgb_, opacity_
+
+    def _forward(
+        self,
+        decoder: torch.nn.Module,
+        triplane: torch.Tensor,
+        rays_o: torch.Tensor,
+        rays_d: torch.Tensor,
+        num_samples_per_ray: Optional[int] = None,
+        rays_bbox: Optional[Tuple[torch.Tensor, torch.Tensor, torch.Tensor]] = None,
+        **kwargs,
+    ):
+        rays_shape = rays_o.shape[:-1]
+        rays_o = rays_o.view(-1, 3)
+        rays_d = rays_d.view(-1, 3)
+        n_rays = rays_o.shape[0]
+
+        if rays_bbox is None:
+            t_near, t_far, rays_valid = rays_intersect_bbox(
+                rays_o, rays_d, self.cfg.radius
+            )
+        else:
+            # precomputed by get_cached_spherical_cameras
+            t_near, t_far, rays_valid = rays_bbox
+            t_near, t_far = t_near.view(-1, 1), t_far.view(-1, 1)
+            rays_valid = rays_valid.view(-1)
+
+        comp_rgb_, opacity_ = self._composite(
+            decoder,
+            triplane,
+            rays_o[rays_valid],
+            rays_d[rays_valid],
+            t_near[rays_valid],
+            t_far[rays_valid],
+            num_samples_per_ray,
+        )
+
         comp_rgb = torch.zeros(
             n_rays, 3, dtype=comp_rgb_.dtype, device=comp_rgb_.device
         )
@@ -150,19 +183,60 @@ class TriplaneNeRFRenderer(BaseModule):
 
         return comp_rgb
 
+    def forward_packed(
+        self,
+        decoder: torch.nn.Module,
+        triplane: torch.Tensor,
+        rays_o: torch.Tensor,
+        rays_d: torch.Tensor,
+        t_near: torch.Tensor,
+        t_far: torch.Tensor,
+        index: torch.Tensor,
+        out: torch.Tensor,
+        num_samples_per_ray: Optional[int] = None,
+    ) -> torch.Tensor:
+        """
+        Render a compact batch of rays that all intersect the bbox and write
+        them as uint8 colors into the preallocated `out` buffer of shape
+        (N_pixels, 3) at the flat pixel positions `index`. All other pixels are
+        set to the white background, so invalid rays are never sampled.
+        """
+        out.fill_(255)
+        if index.numel() == 0:
+            return out
+
+        comp_rgb_, opacity_ = self._composite(
+            decoder, triplane, rays_o, rays_d, t_near, t_far, num_samples_per_ray
+        )
+        comp_rgb_ += 1 - opacity_[..., None]
+        out[index] = (comp_rgb_ * 255.0).to(torch.uint8)
+
+        return out
+
     def forward(
         self,
         decoder: torch.nn.Module,
         triplane: torch.Tensor,
         rays_o: torch.Tensor,
         rays_d: torch.Tensor,
+        num_samples_per_ray: Optional[int] = None,
+        rays_bbox: Optional[Tuple[torch.Tensor, torch.Tensor, torch.Tensor]] = None,
     ) -> Dict[str, torch.Tensor]:
         if triplane.ndim == 4:
-            comp_rgb = self._forward(decoder, triplane, rays_o, rays_d)
+            comp_rgb = self._forward(
+                decoder, triplane, rays_o, rays_d, num_samples_per_ray, rays_bbox
+            )
         else:
             comp_rgb = torch.stack(
                 [
-                    self._forward(decoder, triplane[i], rays_o[i], rays_d[i])
+                    self._forward(
+                        decoder,
+                        triplane[i],
+                        rays_o[i],
+                        rays_d[i],
+                        num_samples_per_ray,
+                        None if rays_bbox is None else tuple(x[i] for x in rays_bbox),
+                    )
                     for i in range(triplane.shape[0])
                 ],
                 dim=0,
@@ -1,7 +1,7 @@
 import math
 import os
 from dataclasses import dataclass, field
-from typing import List, Union
+from typing import Iterator, List, Optional, Tuple, Union
 
 import numpy as np
 import PIL.Image
@@ -16,9 +16,11 @@ from PIL import Image
 from .models.isosurface import MarchingCubeHelper
 from .utils import (
     BaseModule,
+    CameraRays,
     ImagePreprocessor,
+    Mesh,
     find_class,
-    get_spherical_cameras,
+    get_cached_spherical_cameras,
     scale_tensor,
 )
 
@@ -129,36 +131,214 @@ class TSR(BaseModule):
         height: int = 256,
         width: int = 256,
         return_type: str = "pil",
+        views_per_batch: int = 1,
+        num_samples_per_ray: Optional[int] = None,
     ):
-        rays_o, rays_d = get_spherical_cameras(
-            n_views, elevation_deg, camera_distance, fovy_deg, height, width
+        images = []
+        for scene_code in scene_codes:
+            images.append(
+                list(
+                    self.render_iter(
+                        scene_code,
+                        n_views,
+                        elevation_deg=elevation_deg,
+                        camera_distance=camera_distance,
+                        fovy_deg=fovy_deg,
+                        height=height,
+                        width=width,
+                        return_type=return_type,
+                        views_per_batch=views_per_batch,
+                        num_samples_per_ray=num_samples_per_ray,
+                    )
+                )
+            )
+
+        return images
+
+    def render_iter(
+        self,
+        scene_code,
+        n_views: int,
+        elevation_deg: float = 0.0,
+        camera_distance: float = 1.9,
+        fovy_deg: float = 40.0,
+        height: int = 256,
+        width: int = 256,
+        return_type: str = "pil",
+        views_per_batch: int = 1,
+        num_samples_per_ray: Optional[int] = None,
+    ) -> Iterator[Union[PIL.Image.Image, np.ndarray, torch.FloatTensor]]:
+        """
+        Render the views of a single scene code, yielding each frame as soon as
+        its batch is done. `views_per_batch` views are traced as one ray batch.
+
+        For the 8-bit return types ("pil" and "uint8") only rays that hit the
+        scene bbox are sampled, packed across the views of a batch, and written
+        into a reusable uint8 frame buffer.
+        """
+        cameras = get_cached_spherical_cameras(
+            n_views,
+            elevation_deg,
+            camera_distance,
+            fovy_deg,
+            height,
+            width,
+            self.renderer.cfg.radius,
         )
-        rays_o, rays_d = rays_o.to(scene_codes.device), rays_d.to(scene_codes.device)
+
+        if return_type in ["pil", "uint8"]:
+            n_pixels = height * width
+            frame_buffer = torch.empty(
+                views_per_batch * n_pixels,
+                3,
+                dtype=torch.uint8,
+                device=scene_code.device,
+            )
+            for i in range(0, n_views, views_per_batch):
+                j = min(i + views_per_batch, n_views)
+                frames = self._render_packed(
+                    scene_code,
+                    cameras,
+                    i * n_pixels,
+                    j * n_pixels,
+                    frame_buffer,
+                    num_samples_per_ray,
+                )
+                # the buffer is reused by the next batch, so hand out a copy
+                frames = frames.to("cpu", copy=True).view(j - i, height, width, 3)
+                for frame in frames.numpy():
+                    yield Image.fromarray(frame) if return_type == "pil" else frame
+            return
 
         def process_output(image: torch.FloatTensor):
             if return_type == "pt":
                 return image
             elif return_type == "np":
                 return image.detach().cpu().numpy()
-            elif return_type == "pil":
-                return Image.fromarray(
-                    (image.detach().cpu().numpy() * 255.0).astype(np.uint8)
-                )
             else:
                 raise NotImplementedError
 
-        images = []
-        for scene_code in scene_codes:
-            images_ = []
-            for i in range(n_views):
-                with torch.no_grad():
-                    image = self.renderer(
-                        self.decoder, scene_code, rays_o[i], rays_d[i]
-                    )
-                images_.append(process_output(image))
-            images.append(images_)
+        for i in range(0, n_views, views_per_batch):
+            rays_o, rays_d, t_near, t_far, rays_valid = cameras.views(
+                i, i + views_per_batch, scene_code.device
+            )
+            with torch.no_grad():
+                images = self.renderer(
+                    self.decoder,
+                    scene_code,
+                    rays_o,
+                    rays_d,
+                    num_samples_per_ray=num_samples_per_ray,
+                    rays_bbox=(t_near, t_far, rays_valid),
+                )
+            for image in images:
+                yield process_output(image)
 
-        return images
+    def _render_packed(
+        self,
+        scene_code,
+        cameras: CameraRays,
+        pixel_start: int,
+        pixel_end: int,
+        frame_buffer: torch.Tensor,
+        num_samples_per_ray: Optional[int] = None,
+    ) -> torch.Tensor:
+        # render the flat pixel range [pixel_start, pixel_end) of the camera set
+        rays_o, rays_d, t_near, t_far, index = cameras.packed(
+            pixel_start, pixel_end, scene_code.device
+        )
+        with torch.no_grad():
+            return self.renderer.forward_packed(
+                self.decoder,
+                scene_code,
+                rays_o,
+                rays_d,
+                t_near,
+                t_far,
+                index,
+                frame_buffer[: pixel_end - pixel_start],
+                num_samples_per_ray=num_samples_per_ray,
+            )
+
+    def render_progressive(
+        self,
+        scene_code,
+        azimuth_index: int = 0,
+        n_views: int = 1,
+        elevation_deg: float = 0.0,
+        camera_distance: float = 1.9,
+        fovy_deg: float = 40.0,
+        height: int = 256,
+        width: int = 256,
+        levels: Tuple[Tuple[int, int], ...] = ((4, 16), (2, 32)),
+        tile_rows: int = 32,
+        num_samples_per_ray: Optional[int] = None,
+    ) -> Iterator[PIL.Image.Image]:
+        """
+        Render view `azimuth_index` of an `n_views` turntable progressively.
+
+        Each (downscale, num_samples_per_ray) entry of `levels` yields a cheap
+        low resolution frame upsampled to full size. The full quality frame is
+        then refined in bands of `tile_rows` rows over the last preview,
+        yielding after every band, so a UI can show something almost at once.
+        """
+        canvas = None
+        for downscale, level_samples in levels:
+            level_height, level_width = height // downscale, width // downscale
+            cameras = get_cached_spherical_cameras(
+                n_views,
+                elevation_deg,
+                camera_distance,
+                fovy_deg,
+                level_height,
+                level_width,
+                self.renderer.cfg.radius,
+            )
+            n_pixels = level_height * level_width
+            frame_buffer = torch.empty(
+                n_pixels, 3, dtype=torch.uint8, device=scene_code.device
+            )
+            frame = self._render_packed(
+                scene_code,
+                cameras,
+                azimuth_index * n_pixels,
+                (azimuth_index + 1) * n_pixels,
+                frame_buffer,
+                level_samples,
+            )
+            frame = Image.fromarray(
+                frame.cpu().view(level_height, level_width, 3).numpy()
+            ).resize((width, height), Image.BILINEAR)
+            canvas = np.array(frame)
+            yield frame
+
+        cameras = get_cached_spherical_cameras(
+            n_views,
+            elevation_deg,
+            camera_distance,
+            fovy_deg,
+            height,
+            width,
+            self.renderer.cfg.radius,
+        )
+        if canvas is None:
+            canvas = np.full((height, width, 3), 255, dtype=np.uint8)
+        view_start = azimuth_index * height * width
+        tile_buffer = torch.empty(
+            tile_rows * width, 3, dtype=torch.uint8, device=scene_code.device
+        )
+        for row in range(0, height, tile_rows):
+            row_end = min(row + tile_rows, height)
+            tile = self._render_packed(
+                scene_code,
+                cameras,
+                view_start + row * width,
+                view_start + row_end * width,
+                tile_buffer,
+                num_samples_per_ray,
+            )
+            canvas[row:row_end] = tile.cpu().view(row_end - row, width, 3).numpy()
+            yield Image.fromarray(canvas)
 
     def set_marching_cubes_resolution(self, resolution: int):
         if (
@@ -168,7 +348,13 @@ class TSR(BaseModule):
             return
         self.isosurface_helper = MarchingCubeHelper(resolution)
 
-    def extract_mesh(self, scene_codes, resolution: int = 256, threshold: float = 25.0):
+    def extract_mesh(
+        self,
+        scene_codes,
+        resolution: int = 256,
+        threshold: float = 25.0,
+        return_type: str = "trimesh",
+    ):
         self.set_marching_cubes_resolution(resolution)
         meshes = []
         for scene_code in scene_codes:
@@ -194,10 +380,15 @@ class TSR(BaseModule):
                     v_pos,
                     scene_code,
                 )["color"]
-            mesh = trimesh.Trimesh(
-                vertices=v_pos.cpu().numpy(),
-                faces=t_pos_idx.cpu().numpy(),
-                vertex_colors=color.cpu().numpy(),
-            )
+            if return_type == "trimesh":
+                mesh = trimesh.Trimesh(
+                    vertices=v_pos.cpu().numpy(),
+                    faces=t_pos_idx.cpu().numpy(),
+                    vertex_colors=color.cpu().numpy(),
+                )
+            elif return_type == "np":
+                mesh = Mesh.from_tensors(v_pos, t_pos_idx, color)
+            else:
+                raise NotImplementedError
             meshes.append(mesh)
         return meshes
@@ -1,13 +1,14 @@
+import functools
 import importlib
+import io
 import math
 from collections import defaultdict
 from dataclasses import dataclass
-from typing import Any, Callable, Dict, List, Optional, Tuple, Union
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple, Union
 
 import imageio
 import numpy as np
 import PIL.Image
-import rembg
 import torch
 import torch.nn as nn
 import torch.nn.functional as F
@@ -399,6 +400,107 @@ def get_spherical_cameras(
     return rays_o, rays_d
 
 
+@dataclass
+class CameraRays:
+    # kept on the CPU, batches are moved to the render device by `views`/`packed`
+    origins: torch.FloatTensor  # (N_views, 3), the same for every pixel of a view
+    rays_d: torch.FloatTensor  # (N_views, H, W, 3)
+    t_near: torch.FloatTensor  # (N_views, H, W, 1)
+    t_far: torch.FloatTensor  # (N_views, H, W, 1)
+    rays_valid: torch.BoolTensor  # (N_views, H, W)
+    # rays intersecting the bbox only, in flat pixel order over all views
+    valid_index: torch.LongTensor  # flat pixel index into (N_views * H * W)
+    valid_rays_d: torch.FloatTensor
+    valid_t_near: torch.FloatTensor
+    valid_t_far: torch.FloatTensor
+
+    def views(self, start: int, end: int, device) -> Tuple[torch.Tensor, ...]:
+        """
+        Full ray grids of the views [start, end) on `device`, as
+        (rays_o, rays_d, t_near, t_far, rays_valid).
+        """
+        rays_d = self.rays_d[start:end].to(device)
+        rays_o = self.origins[start:end].to(device)[:, None, None, :]
+        return (
+            rays_o.expand(rays_d.shape).contiguous(),
+            rays_d,
+            self.t_near[start:end].to(device),
+            self.t_far[start:end].to(device),
+            self.rays_valid[start:end].to(device),
+        )
+
+    def packed(
+        self, pixel_start: int, pixel_end: int, device
+    ) -> Tuple[torch.Tensor, ...]:
+        """
+        The rays of the flat pixel range [pixel_start, pixel_end) that hit the
+        bbox on `device`, as (rays_o, rays_d, t_near, t_far, index) with `index`
+        relative to `pixel_start`.
+        """
+        # valid_index is sorted, so the rays of a flat pixel range are contiguous
+        bounds = torch.tensor([pixel_start, pixel_end])
+        start, end = torch.searchsorted(self.valid_index, bounds).tolist()
+        index = self.valid_index[start:end]
+        n_pixels = self.rays_valid.shape[1] * self.rays_valid.shape[2]
+        return (
+            self.origins[index // n_pixels].to(device),
+            self.valid_rays_d[start:end].to(device),
+            self.valid_t_near[start:end].to(device),
+            self.valid_t_far[start:end].to(device),
+            (index - pixel_start).to(device),
+        )
+
+
+@functools.lru_cache(maxsize=4)
+def get_cached_spherical_cameras(
+    n_views: int,
+    elevation_deg: float,
+    camera_distance: float,
+    fovy_deg: float,
+    height: int,
+    width: int,
+    radius: float,
+) -> CameraRays:
+    """
+    Cached `get_spherical_cameras`, together with the `rays_intersect_bbox`
+    results for the bounding box of the given radius and a compact packing of
+    the rays that hit it. The cache lives on the CPU and only the batch being
+    rendered is copied to the device, see `clear_camera_cache` to free it. The
+    returned tensors are shared between callers and must not be modified in
+    place.
+    """
+    rays_o, rays_d = get_spherical_cameras(
+        n_views, elevation_deg, camera_distance, fovy_deg, height, width
+    )
+    rays_d = rays_d.contiguous()
+    # rays_o is an expanded view of one origin per view, only keep the origins
+    origins = rays_o[:, 0, 0].contiguous()
+    t_near, t_far, rays_valid = rays_intersect_bbox(
+        rays_o.contiguous(), rays_d, radius
+    )
+
+    valid_index = torch.nonzero(rays_valid.view(-1)).squeeze(-1)
+
+    return CameraRays(
+        origins=origins,
+        rays_d=rays_d,
+        t_near=t_near,
+        t_far=t_far,
+        rays_valid=rays_valid,
+        valid_index=valid_index,
+        valid_rays_d=rays_d.view(-1, 3)[valid_index],
+        valid_t_near=t_near.view(-1, 1)[valid_index],
+        valid_t_far=t_far.view(-1, 1)[valid_index],
+    )
+
+
+def clear_camera_cache() -> None:
+    """
+    Free the camera rays cached by `get_cached_spherical_cameras`.
+    """
+    get_cached_spherical_cameras.cache_clear()
+
+
 def remove_background(
     image,
     rembg_session=None,
@@ -414,6 +516,8 @@ def remove_background(
         do_remove = False
     do_remove = do_remove or force
     if do_remove:
+        import rembg
+
         image = rembg.remove(
             image,
             session=rembg_session,
@@ -468,17 +572,117 @@ def resize_foreground(
     return new_image
 
 
+# render settings for TSR.render_iter, trading quality for turntable speed
+TURNTABLE_PRESETS: Dict[str, Dict[str, int]] = {
+    "draft": dict(height=128, width=128, num_samples_per_ray=32, views_per_batch=8),
+    "preview": dict(height=256, width=256, num_samples_per_ray=64, views_per_batch=4),
+    "full": dict(height=512, width=512, num_samples_per_ray=128, views_per_batch=1),
+}
+
+
 def save_video(
-    frames: List[PIL.Image.Image],
+    frames: Iterable[Union[PIL.Image.Image, np.ndarray]],
     output_path: str,
     fps: int = 30,
 ):
-    # use imageio to save video
-    frames = [np.array(frame) for frame in frames]
+    # use imageio to save video, frames are written as they are produced so a
+    # generator such as TSR.render_iter never holds the whole clip in memory
     writer = imageio.get_writer(output_path, fps=fps)
-    for frame in frames:
-        writer.append_data(frame)
-    writer.close()
+    try:
+        for frame in frames:
+            writer.append_data(np.asarray(frame))
+    finally:
+        writer.close()
+
+
+class Mesh:
+    """
+    Array-backed triangle mesh returned by `TSR.extract_mesh(..., return_type="np")`.
+
+    Holds plain numpy vertex, face and color arrays (sharing memory with the
+    source CPU tensors) and skips trimesh's validation and caching on
+    construction. Use `to_trimesh` when the full trimesh API is needed.
+    """
+
+    __slots__ = ("vertices", "faces", "vertex_colors")
+
+    def __init__(
+        self,
+        vertices: np.ndarray,
+        faces: np.ndarray,
+        vertex_colors: Optional[np.ndarray] = None,
+    ) -> None:
+        self.vertices = vertices
+        self.faces = faces
+        self.vertex_colors = vertex_colors
+
+    @classmethod
+    def from_tensors(
+        cls,
+        v_pos: torch.Tensor,
+        t_pos_idx: torch.Tensor,
+        color: Optional[torch.Tensor] = None,
+    ) -> "Mesh":
+        # .cpu() is a no-op for CPU tensors, so .numpy() returns a view
+        return cls(
+            v_pos.detach().cpu().numpy(),
+            t_pos_idx.detach().cpu().numpy(),
+            None if color is None else color.detach().cpu().numpy(),
+        )
+
+    def apply_transform(self, matrix: np.ndarray) -> "Mesh":
+        matrix = np.asanyarray(matrix, dtype=np.float64)
+        vertices = self.vertices @ matrix[:3, :3].T + matrix[:3, 3]
+        self.vertices = vertices.astype(self.vertices.dtype, copy=False)
+        # a reflection flips the winding, keep the normals pointing outwards
+        if np.linalg.det(matrix[:3, :3]) < 0:
+            self.faces = np.ascontiguousarray(self.faces[:, ::-1])
+        return self
+
+    def apply_scale(self, scaling: Union[float, List[float]]) -> "Mesh":
+        matrix = np.eye(4)
+        matrix[:3, :3] *= np.broadcast_to(np.asanyarray(scaling, dtype=np.float64), 3)
+        return self.apply_transform(matrix)
+
+    def to_trimesh(self, **kwargs) -> trimesh.Trimesh:
+        return trimesh.Trimesh(
+            vertices=self.vertices,
+            faces=self.faces,
+            vertex_colors=self.vertex_colors,
+            **kwargs,
+        )
+
+    def export(self, file_obj=None, file_type: Optional[str] = None, **kwargs):
+        if file_type is None:
+            if not isinstance(file_obj, str):
+                raise ValueError("file_type is required when file_obj is not a path")
+            file_type = file_obj.rsplit(".", 1)[-1]
+        if file_type.lower() != "obj":
+            return self.to_trimesh().export(file_obj, file_type=file_type, **kwargs)
+
+        buffer = io.StringIO()
+        if self.vertex_colors is not None:
+            colors = self.vertex_colors[:, :3]
+            if colors.dtype == np.uint8:
+                colors = colors / 255.0
+            np.savetxt(
+                buffer,
+                np.hstack([self.vertices, colors]),
+                fmt="v %.8f %.8f %.8f %.4f %.4f %.4f",
+            )
+        else:
+            np.savetxt(buffer, self.vertices, fmt="v %.8f %.8f %.8f")
+        np.savetxt(buffer, self.faces + 1, fmt="f %d %d %d")
+        obj_data = buffer.getvalue()
+
+        if file_obj is None:
+            return obj_data
+        if isinstance(file_obj, str):
+            with open(file_obj, "w") as f:
+                f.write(obj_data)
+        else:
+            file_obj.write(obj_data)
+        return obj_data
 
 
 def to_gradio_3d_orientation(mesh):